@@ -0,0 +1,266 @@
+#!/usr/bin/python3
+# Banco de pruebas reproducible de la Bitácora Cronos - cronos_bench.py
+#
+# Genera bases de datos sintéticas de distintos tamaños y mide los puntos de
+# entrada principales de cronos_manager. Cada caso se ejecuta en un proceso
+# propio (apuntado a la base sintética con CRONOS_DB) para medir también su
+# pico de memoria. El informe es JSON, comparable entre commits:
+#
+#   python3 cronos_bench.py [--tamanos 10000,100000,1000000] [--repeticiones 20]
+#                           [--directorio DIR] [--salida informe.json] [--comparar anterior.json]
+
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import cronos_manager
+from cronos_manager import _extraer_opcion, _percentil
+
+TAMANOS = [10000, 100000, 1000000]
+REPETICIONES = 20
+SEMILLA = 1234
+# Forma parte del nombre de las bases sintéticas: subirla al cambiar el generador o el esquema para no medir bases viejas.
+VERSION_GENERADOR = 2
+
+# Reparto de las filas sintéticas entre tablas.
+PROPORCIONES = {
+    "eventos_sistema": 0.80,
+    "conversaciones": 0.15,
+    "memoria_proyectos": 0.03,
+    "tareas_omnicompute": 0.02
+}
+
+CASOS = ["registrar_evento", "buscar_similitud", "revisar_ultima_actividad",
+         "analizar_comportamientos_sistema", "actualizar_estado_tarea_omnicompute"]
+
+_PROGRAMAS = ["git status", "git diff", "git commit -m", "ls -la", "cd", "python3", "pip install", "vim", "cat", "grep -rn",
+              "bazel build", "bazel test", "docker run", "make -j8", "ssh", "tmux attach", "htop", "apt update", "curl -sL"]
+_ARGUMENTOS = ["//tensorflow/tools/pip_package:build_pip_package", "src/main.py", "README.md", "--config=opt", "numpy",
+               "keras_applications", "/data/data/com.termux/files/home", "origin main", "-v", "build.log", "'fix: arm64'"]
+_PALABRAS = ["compilación", "tensorflow", "bazel", "memoria", "error", "arm64", "wheel", "dependencia", "prueba", "contenedor",
+             "Termux", "kernel", "optimización", "versión", "caché", "registro", "tarea", "plataforma", "imagen", "docker"]
+
+def _frase(rnd, minimo, maximo):
+    """Genera texto en prosa de longitud aproximada entre minimo y maximo caracteres."""
+    objetivo = rnd.randint(minimo, maximo)
+    palabras = []
+    while sum(len(p) + 1 for p in palabras) < objetivo:
+        palabras.append(rnd.choice(_PALABRAS))
+    return " ".join(palabras).capitalize() + "."
+
+def _comando(rnd):
+    """Genera un comando de shell verosímil (la mayoría repetidos, algunos únicos)."""
+    comando = rnd.choice(_PROGRAMAS)
+    for _ in range(rnd.randint(0, 3)):
+        comando += " " + rnd.choice(_ARGUMENTOS)
+    if rnd.random() < 0.2:
+        comando += f" {rnd.randint(1, 100000)}"
+    return comando
+
+def generar_base_sintetica(ruta, filas, semilla=SEMILLA):
+    """Crea (o reutiliza, si ya existe) una base de datos sintética con 'filas' filas repartidas entre las cuatro tablas."""
+    if os.path.exists(ruta):
+        return
+    rnd = random.Random(semilla)
+    cronos_manager.DB_PATH = ruta
+    conn = cronos_manager._obtener_conexion()
+    inicio = datetime.utcnow() - timedelta(days=90)
+    paso = timedelta(days=90) / filas
+    directorios = [f"/data/data/com.termux/files/home/proyecto{i}/src" for i in range(200)]
+
+    def marca(i):
+        return (inicio + paso * i).strftime('%Y-%m-%d %H:%M:%S')
+
+    lote = 10000
+    for tabla, proporcion in PROPORCIONES.items():
+        total = int(filas * proporcion)
+        for base in range(0, total, lote):
+            filas_lote = []
+            for i in range(base, min(total, base + lote)):
+                # Posición temporal proporcional dentro del periodo, igual para todas las tablas.
+                ts = marca(int(i / proporcion))
+                if tabla == "eventos_sistema":
+                    texto = _comando(rnd)
+                    filas_lote.append((ts, rnd.choice(directorios), texto, str(rnd.randint(1, 20))))
+                elif tabla == "conversaciones":
+                    texto = _frase(rnd, 40, 600)
+                    filas_lote.append((ts, str(rnd.randint(1, 20)), rnd.choice(["Comandante", "Gemini"]), texto))
+                elif tabla == "memoria_proyectos":
+                    texto = _frase(rnd, 20, 300)
+                    filas_lote.append((ts, f"proyecto{rnd.randint(1, 50)}", f"clave{i}", texto))
+                else:
+                    texto = _frase(rnd, 20, 120)
+                    filas_lote.append((ts, f"tarea-{i}", texto, rnd.choice(["arm64", "x86_64"]), rnd.choice(["DONE", "FAILED", "RUNNING"]), ts))
+            textos = [fila[2] if tabla in ("eventos_sistema", "tareas_omnicompute") else fila[-1] for fila in filas_lote]
+            filas_lote = [fila + (embedding, cronos_manager.EMBEDDING_VERSION)
+                          for fila, embedding in zip(filas_lote, cronos_manager._embeddings_en_lote(textos))]
+            sql = {
+                "eventos_sistema": "INSERT INTO eventos_sistema (timestamp, directorio, comando, sesion_id, embedding_vector, embedding_version) VALUES (?, ?, ?, ?, ?, ?)",
+                "conversaciones": "INSERT INTO conversaciones (timestamp, sesion_id, autor, texto, embedding_vector, embedding_version) VALUES (?, ?, ?, ?, ?, ?)",
+                "memoria_proyectos": "INSERT INTO memoria_proyectos (timestamp, proyecto, clave, valor, embedding_vector, embedding_version) VALUES (?, ?, ?, ?, ?, ?)",
+                "tareas_omnicompute": "INSERT INTO tareas_omnicompute (timestamp, task_id, description, platform, status, start_time, embedding_vector, embedding_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            }[tabla]
+            with cronos_manager.transaccion():
+                conn.executemany(sql, filas_lote)
+    cronos_manager.cerrar_conexion()
+
+def _ejecutar_caso(caso, repeticiones):
+    """Ejecuta un caso en este proceso (ya apuntado a la base sintética) y devuelve sus tiempos en ms."""
+    rnd = random.Random(SEMILLA)
+    tareas = [fila[0] for fila in cronos_manager._obtener_conexion().execute("SELECT task_id FROM tareas_omnicompute LIMIT 1000")]
+    tiempos = []
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        # La primera llamada incluye la carga de módulos y estructuras auxiliares; se informa aparte.
+        for _ in range(repeticiones + 1):
+            if caso == "buscar_similitud":
+                # Sin caché de resultados: se mide la búsqueda en sí.
+                llamada = lambda: cronos_manager.buscar_similitud(_comando(rnd), 5, usar_cache=False)
+            elif caso == "revisar_ultima_actividad":
+                llamada = cronos_manager.revisar_ultima_actividad
+            elif caso == "analizar_comportamientos_sistema":
+                llamada = cronos_manager.analizar_comportamientos_sistema
+            elif caso == "actualizar_estado_tarea_omnicompute":
+                tarea = rnd.choice(tareas)
+                llamada = lambda: cronos_manager.actualizar_estado_tarea_omnicompute(tarea, "DONE", _frase(rnd, 200, 2000))
+            inicio = time.perf_counter()
+            llamada()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+def _pico_rss_kb():
+    """Devuelve el pico de RSS de este proceso en KB (VmHWM de /proc/self/status)."""
+    # ru_maxrss (de wait4 o de RUSAGE_SELF) arrastra el pico heredado del padre a través de fork y exec,
+    # y daría el mismo valor para todos los casos; VmHWM solo cuenta la memoria de este proceso.
+    with open("/proc/self/status") as f:
+        return next((int(linea.split()[1]) for linea in f if linea.startswith("VmHWM:")), 0)
+
+# Ejecuta cronos_evento.py en el mismo proceso, como lo haría el intérprete, y escribe su pico de RSS como
+# última línea (la misma lectura que _pico_rss_kb: importar este módulo encarecería el arranque medido).
+_GANCHO_MEDIDO = """import os, sys
+sys.argv = sys.argv[1:]
+sys.path[0] = os.path.dirname(sys.argv[0])
+try:
+    exec(compile(open(sys.argv[0]).read(), sys.argv[0], "exec"), {"__name__": "__main__", "__file__": sys.argv[0]})
+finally:
+    with open("/proc/self/status") as f:
+        print(next((int(linea.split()[1]) for linea in f if linea.startswith("VmHWM:")), 0))
+"""
+
+def _en_subproceso(argumentos, ruta):
+    """Lanza un proceso hijo sobre la base 'ruta' y devuelve (salida, segundos)."""
+    inicio = time.perf_counter()
+    salida = subprocess.run(argumentos, env=dict(os.environ, CRONOS_DB=ruta), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            check=True).stdout
+    return salida, time.perf_counter() - inicio
+
+def _resumen(caso, filas, tiempos, rss_kb, primera=None):
+    """Agrega los tiempos de un caso en una entrada del informe."""
+    return {
+        "caso": caso,
+        "filas": filas,
+        "repeticiones": len(tiempos),
+        "p50_ms": round(_percentil(tiempos, 50), 3),
+        "p95_ms": round(_percentil(tiempos, 95), 3),
+        "media_ms": round(sum(tiempos) / len(tiempos), 3),
+        "ops_por_s": round(len(tiempos) / (sum(tiempos) / 1000), 2),
+        "primera_ms": round(primera, 3) if primera is not None else None,
+        "rss_pico_kb": rss_kb
+    }
+
+def medir(ruta, filas, repeticiones):
+    """Mide todos los casos sobre una base sintética y devuelve sus entradas del informe."""
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    resultados = []
+
+    # Arranque en frío del gancho: un proceso nuevo por evento, como en el prompt.
+    tiempos, rss = [], 0
+    for i in range(repeticiones):
+        salida, segundos = _en_subproceso([sys.executable, "-c", _GANCHO_MEDIDO, os.path.join(directorio, "cronos_evento.py"), "bench", str(i)], ruta)
+        tiempos.append(segundos * 1000)
+        rss = max(rss, int(salida.splitlines()[-1]))
+    resultados.append(_resumen("registrar_evento", filas, tiempos, rss))
+
+    for caso in CASOS[1:]:
+        salida, _ = _en_subproceso([sys.executable, os.path.abspath(__file__), "--caso", caso, "--repeticiones", str(repeticiones)], ruta)
+        medicion = json.loads(salida)
+        tiempos = medicion["tiempos"]
+        resultados.append(_resumen(caso, filas, tiempos[1:], medicion["rss_pico_kb"], primera=tiempos[0]))
+    return resultados
+
+def _revision_git():
+    """Devuelve el commit actual del repositorio, si está disponible."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def comparar(informe, anterior):
+    """Muestra la variación de p50 de cada caso frente a un informe anterior."""
+    previos = {(r["caso"], r["filas"]): r for r in anterior["resultados"]}
+    print(f"--- [ Comparación con {anterior.get('commit')} ] ---", file=sys.stderr)
+    for r in informe["resultados"]:
+        previo = previos.get((r["caso"], r["filas"]))
+        if previo and previo["p50_ms"]:
+            ratio = r["p50_ms"] / previo["p50_ms"]
+            aviso = "  <-- REGRESIÓN" if ratio > 1.10 else ""
+            print(f"{r['caso']:<38} {r['filas']:>8} filas  p50 {previo['p50_ms']:>10.2f} -> {r['p50_ms']:>10.2f} ms ({ratio:.2f}x){aviso}",
+                  file=sys.stderr)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    caso = _extraer_opcion(args, '--caso')
+    repeticiones = int(_extraer_opcion(args, '--repeticiones', REPETICIONES))
+    if caso:
+        # Modo interno: un caso en un proceso hijo; la base llega por CRONOS_DB.
+        tiempos = _ejecutar_caso(caso, repeticiones)
+        print(json.dumps({"tiempos": tiempos, "rss_pico_kb": _pico_rss_kb()}))
+        sys.exit(0)
+
+    tamanos = [int(t) for t in _extraer_opcion(args, '--tamanos', ",".join(map(str, TAMANOS))).split(",")]
+    directorio = _extraer_opcion(args, '--directorio', os.path.join(os.getcwd(), "cronos_bench_datos"))
+    salida = _extraer_opcion(args, '--salida')
+    anterior = _extraer_opcion(args, '--comparar')
+    os.makedirs(directorio, exist_ok=True)
+
+    informe = {
+        "commit": _revision_git(),
+        "generador": VERSION_GENERADOR,
+        "fecha": datetime.utcnow().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "plataforma": platform.platform(),
+        "resultados": []
+    }
+    for filas in tamanos:
+        ruta = os.path.join(directorio, f"cronos_{filas}_v{VERSION_GENERADOR}.db")
+        print(f"Preparando base sintética de {filas} filas en {ruta}...", file=sys.stderr)
+        generar_base_sintetica(ruta, filas)
+        # Cada medición parte de la misma base: se trabaja sobre una copia desechable.
+        copia = os.path.join(directorio, f"cronos_{filas}_v{VERSION_GENERADOR}_medicion.db")
+        for sufijo in ("", "-wal", "-shm"):
+            if os.path.exists(copia + sufijo):
+                os.remove(copia + sufijo)
+        shutil.rmtree(copia + ".vec", ignore_errors=True)
+        with sqlite3.connect(ruta) as origen, sqlite3.connect(copia) as destino:
+            origen.backup(destino)
+        print(f"Midiendo {filas} filas...", file=sys.stderr)
+        informe["resultados"].extend(medir(copia, filas, repeticiones))
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if salida:
+        with open(salida, "w") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+    if anterior:
+        with open(anterior) as f:
+            comparar(informe, json.load(f))
@@ -0,0 +1,15 @@
+#!/usr/bin/python3
+# Punto de entrada de baja latencia para el gancho del prompt - cronos_evento.py
+#
+# Uso: python3 cronos_evento.py <comando ejecutado>
+# A diferencia de invocar cronos_manager.py directamente, este script es mínimo:
+# cronos_manager se importa como módulo (su bytecode queda en caché) y el
+# índice ANN, si está activo, se pone al día en la próxima búsqueda.
+
+import sys
+
+from cronos_manager import registrar_evento
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        registrar_evento(' '.join(sys.argv[1:]), indexar=False)
@@ -5,78 +5,651 @@ import sqlite3
 import sys
 import os
 from datetime import datetime
-import json
-import numpy as np
+import fcntl
+import itertools
+import time
+import atexit
+import contextlib
+import importlib.util
+import codecs
+import heapq
+import zlib
+from array import array
 
-DB_PATH = "/data/data/com.termux/files/home/cronos.db"
+def _importar_diferido(nombre):
+    """Importa un módulo de forma diferida: solo se carga al acceder a su primer atributo."""
+    if nombre in sys.modules:
+        # Ya importado (p. ej. por quien importa este módulo): sustituirlo duplicaría el módulo.
+        return sys.modules[nombre]
+    spec = importlib.util.find_spec(nombre)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nombre] = modulo
+    loader.exec_module(modulo)
+    return modulo
+
+# NumPy y los módulos auxiliares solo hacen falta para búsquedas, índices y mantenimiento;
+# el registro de eventos desde el gancho del prompt no llega a cargarlos.
+np = _importar_diferido("numpy")
+json = _importar_diferido("json")
+shutil = _importar_diferido("shutil")
+statistics = _importar_diferido("statistics")
+subprocess = _importar_diferido("subprocess")
+tempfile = _importar_diferido("tempfile")
+socket = _importar_diferido("socket")
+signal = _importar_diferido("signal")
+futures = _importar_diferido("concurrent.futures")
+hashlib = _importar_diferido("hashlib")
+re = _importar_diferido("re")
+resource = _importar_diferido("resource")
+select = _importar_diferido("select")
+
+DB_PATH = os.environ.get("CRONOS_DB", "/data/data/com.termux/files/home/cronos.db")
+
+# Tablas con columna embedding_vector y la columna de texto de la que se calcula.
+EMBEDDING_TABLES = {
+    "eventos_sistema": "comando",
+    "conversaciones": "texto",
+    "memoria_proyectos": "valor",
+    "tareas_omnicompute": "description"
+}
+
+# Los embeddings se guardan como BLOB de 256 float32 little-endian (1 KB fijo),
+# legibles con np.frombuffer sin copia ni parseo.
+EMBEDDING_DIM = 256
+EMBEDDING_DTYPE = '<f4'
+EMBEDDING_BYTES = EMBEDDING_DIM * 4
+
+# Versión de _generate_simple_embedding: se guarda en cada fila (embedding_version) y debe incrementarse
+# al cambiar la función; las filas con otra versión se excluyen de la búsqueda hasta --recalcular_embeddings.
+EMBEDDING_VERSION = 1
 
 def _generate_simple_embedding(text):
     """Genera un embedding simplificado para un texto dado (frecuencia de caracteres)."""
     # Este es un embedding muy básico, solo para fines de demostración y prueba.
     # En un entorno real, usaríamos modelos de embedding pre-entrenados.
-    char_counts = [0] * 256  # Para caracteres ASCII extendidos
+    char_counts = [0] * EMBEDDING_DIM  # Para caracteres ASCII extendidos
     for char in text:
-        if ord(char) < 256:
+        if ord(char) < EMBEDDING_DIM:
             char_counts[ord(char)] += 1
-    return json.dumps(char_counts)
+    embedding = array('f', char_counts)
+    if sys.byteorder != 'little':
+        embedding.byteswap()
+    return embedding.tobytes()
+
+def _embeddings_en_lote(textos):
+    """Calcula de una vez los embeddings de una lista de textos (mismo resultado que _generate_simple_embedding)."""
+    if not textos:
+        return []
+    # Todos los caracteres en un solo vector de puntos de código y un bincount sobre (fila, carácter).
+    codigos = np.frombuffer("".join(textos).encode("utf-32-le", "surrogatepass"), dtype='<u4')
+    filas = np.repeat(np.arange(len(textos)), [len(texto) for texto in textos])
+    validos = codigos < EMBEDDING_DIM
+    cuentas = np.bincount(filas[validos] * EMBEDDING_DIM + codigos[validos], minlength=len(textos) * EMBEDDING_DIM)
+    return [fila.tobytes() for fila in cuentas.reshape(len(textos), EMBEDDING_DIM).astype(EMBEDDING_DTYPE)]
 
-def _check_and_add_embedding_column():
+def _decode_embeddings(blobs):
+    """Decodifica en bloque una secuencia de BLOBs de embedding a una matriz (N x 256)."""
+    if not blobs:
+        return np.empty((0, EMBEDDING_DIM), dtype=EMBEDDING_DTYPE)
+    return np.frombuffer(b"".join(blobs), dtype=EMBEDDING_DTYPE).reshape(-1, EMBEDDING_DIM)
+
+def _check_and_add_embedding_column(conn):
     """Verifica y añade la columna embedding_vector a las tablas si no existe."""
-    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
-    tables = {
-        "eventos_sistema": "comando",
-        "conversaciones": "texto",
-        "memoria_proyectos": "valor",
-        "tareas_omnicompute": "description"
-    }
-
-    for table, text_column in tables.items():
+    for table in EMBEDDING_TABLES:
         cursor.execute(f"PRAGMA table_info({table})")
         columns = [col[1] for col in cursor.fetchall()]
         if "embedding_vector" not in columns:
             try:
-                cursor.execute(f"ALTER TABLE {table} ADD COLUMN embedding_vector TEXT")
-                conn.commit()
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN embedding_vector BLOB")
                 # print(f"Columna 'embedding_vector' añadida a la tabla '{table}'.")
             except sqlite3.Error as e:
                 # print(f"Error al añadir columna 'embedding_vector' a la tabla '{table}': {e}")
-                pass
-    conn.close()
+                _error_silenciado("_check_and_add_embedding_column", e)
+
+# --- Migraciones de esquema: la migración i lleva la base de datos a PRAGMA user_version = i ---
+
+def _ejecutar_script(conn, script):
+    """Ejecuta un script SQL sentencia a sentencia dentro de la transacción en curso (executescript la confirmaría)."""
+    sentencia = ""
+    for linea in script.splitlines(keepends=True):
+        sentencia += linea
+        if sqlite3.complete_statement(sentencia):
+            conn.execute(sentencia)
+            sentencia = ""
+
+def _migracion_1(conn):
+    """Tablas base de la bitácora y columna embedding_vector en las que ya existían."""
+    _ejecutar_script(conn, """
+        CREATE TABLE IF NOT EXISTS eventos_sistema (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            directorio TEXT,
+            comando TEXT NOT NULL,
+            sesion_id TEXT,
+            embedding_vector BLOB
+        );
+        CREATE TABLE IF NOT EXISTS conversaciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            sesion_id TEXT,
+            autor TEXT NOT NULL,
+            texto TEXT NOT NULL,
+            embedding_vector BLOB
+        );
+        CREATE TABLE IF NOT EXISTS memoria_proyectos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            proyecto TEXT NOT NULL,
+            clave TEXT NOT NULL,
+            valor TEXT,
+            embedding_vector BLOB
+        );
+        CREATE TABLE IF NOT EXISTS tareas_omnicompute (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            task_id TEXT NOT NULL,
+            description TEXT,
+            platform TEXT,
+            status TEXT,
+            start_time TEXT,
+            end_time TEXT,
+            output_log TEXT,
+            error_log TEXT,
+            embedding_vector BLOB
+        );
+    """)
+    _check_and_add_embedding_column(conn)
+
+def _migracion_2(conn):
+    """Índices para las consultas frecuentes y clave única (proyecto, clave) en memoria_proyectos."""
+    # Sin restricción única, INSERT OR REPLACE acumulaba duplicados: se conserva el más reciente.
+    conn.execute("DELETE FROM memoria_proyectos WHERE id NOT IN (SELECT MAX(id) FROM memoria_proyectos GROUP BY proyecto, clave)")
+    _ejecutar_script(conn, """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_memoria_proyecto_clave ON memoria_proyectos (proyecto, clave);
+        CREATE INDEX IF NOT EXISTS idx_eventos_timestamp ON eventos_sistema (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_conversaciones_timestamp ON conversaciones (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_memoria_timestamp ON memoria_proyectos (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_tareas_timestamp ON tareas_omnicompute (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_tareas_task_id ON tareas_omnicompute (task_id);
+        CREATE INDEX IF NOT EXISTS idx_eventos_comando ON eventos_sistema (comando);
+        CREATE INDEX IF NOT EXISTS idx_eventos_directorio ON eventos_sistema (directorio);
+    """)
 
-_check_and_add_embedding_column()
+def _migracion_3(conn):
+    """Tablas de agregados incrementales por hora y sesión para el análisis de comportamientos."""
+    _ejecutar_script(conn, """
+        CREATE TABLE IF NOT EXISTS rollup_comandos (
+            hora TEXT NOT NULL,
+            sesion_id TEXT NOT NULL,
+            comando TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            PRIMARY KEY (hora, sesion_id, comando)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS rollup_directorios (
+            hora TEXT NOT NULL,
+            sesion_id TEXT NOT NULL,
+            directorio TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            PRIMARY KEY (hora, sesion_id, directorio)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS rollup_estado (
+            nombre TEXT PRIMARY KEY,
+            ultimo_id INTEGER NOT NULL
+        );
+        DROP INDEX IF EXISTS idx_eventos_comando;
+        DROP INDEX IF EXISTS idx_eventos_directorio;
+    """)
+    # Los GROUP BY completos ya no se ejecutan: sus índices solo encarecían cada inserción del gancho.
 
-def registrar_evento(comando):
-    """Registra un nuevo comando en la tabla eventos_sistema."""
+# Índices de texto completo: tabla de contenido -> (tabla FTS5, columna indexada).
+_TABLAS_FTS = {
+    "eventos_sistema": ("eventos_fts", "comando"),
+    "conversaciones": ("conversaciones_fts", "texto"),
+    "memoria_proyectos": ("memoria_fts", "valor"),
+    "tareas_omnicompute": ("tareas_fts", "description")
+}
+
+def _migracion_4(conn):
+    """Índices FTS5 de contenido externo, sincronizados por triggers, sobre las columnas de texto."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        directorio_actual = os.getcwd()
-        sesion_id = os.getenv('TERMUX_SESSION_ID', 'default_session')
-        embedding = _generate_simple_embedding(comando)
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_disponible USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_disponible")
+    except sqlite3.OperationalError:
+        # SQLite compilado sin FTS5: la búsqueda por palabras clave queda desactivada.
+        return
 
-        cursor.execute(
-            "INSERT INTO eventos_sistema (directorio, comando, sesion_id, embedding_vector) VALUES (?, ?, ?, ?)",
-            (directorio_actual, comando, sesion_id, embedding)
+    for tabla, (fts, columna) in _TABLAS_FTS.items():
+        _ejecutar_script(conn, f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columna}, content='{tabla}', content_rowid='id');
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabla} BEGIN
+                INSERT INTO {fts} (rowid, {columna}) VALUES (new.id, new.{columna});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabla} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {columna}) VALUES ('delete', old.id, old.{columna});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columna} ON {tabla} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {columna}) VALUES ('delete', old.id, old.{columna});
+                INSERT INTO {fts} (rowid, {columna}) VALUES (new.id, new.{columna});
+            END;
+        """)
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+def _migracion_5(conn):
+    """Logs de tareas Omni-Compute en fragmentos comprimidos de solo anexado."""
+    _ejecutar_script(conn, """
+        CREATE TABLE IF NOT EXISTS tareas_log_chunks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id TEXT NOT NULL,
+            flujo TEXT NOT NULL CHECK (flujo IN ('output', 'error')),
+            bytes_originales INTEGER NOT NULL,
+            datos BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_log_chunks_tarea ON tareas_log_chunks (task_id, flujo, id);
+    """)
+
+def _migracion_6(conn):
+    """Puntos de control de las importaciones masivas (posición en bytes ya confirmada por fichero)."""
+    _ejecutar_script(conn, """
+        CREATE TABLE IF NOT EXISTS importaciones (
+            ruta TEXT PRIMARY KEY,
+            formato TEXT NOT NULL,
+            desplazamiento INTEGER NOT NULL,
+            filas INTEGER NOT NULL,
+            actualizado DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+def _migracion_7(conn):
+    """Columna embedding_version en las tablas con embeddings."""
+    # Con DEFAULT, ADD COLUMN no reescribe la tabla: las filas existentes quedan marcadas como versión 1,
+    # la única función de embedding que ha existido hasta ahora. Las escrituras siempre indican la versión.
+    for tabla in EMBEDDING_TABLES:
+        columnas = [col[1] for col in conn.execute(f"PRAGMA table_info({tabla})")]
+        if "embedding_version" not in columnas:
+            conn.execute(f"ALTER TABLE {tabla} ADD COLUMN embedding_version INTEGER DEFAULT 1")
+
+def _migracion_8(conn):
+    """Caché de búsquedas por similitud, contadores persistentes y triggers que cuentan las modificaciones de las tablas buscables."""
+    _ejecutar_script(conn, """
+        CREATE TABLE IF NOT EXISTS cache_busquedas (
+            clave TEXT PRIMARY KEY,
+            consulta TEXT NOT NULL,
+            top_n INTEGER NOT NULL,
+            version TEXT NOT NULL,
+            resultados TEXT NOT NULL,
+            ultimo_uso REAL NOT NULL,
+            usos INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_cache_ultimo_uso ON cache_busquedas (ultimo_uso);
+        CREATE TABLE IF NOT EXISTS contadores (
+            nombre TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL
+        );
+    """)
+    # Las inserciones se detectan por MAX(id); borrados y cambios (y los reemplazos de memoria_proyectos,
+    # que no disparan triggers de borrado) incrementan un contador que invalida la caché.
+    for tabla in ("eventos_sistema", "conversaciones", "memoria_proyectos"):
+        eventos = ("DELETE", "UPDATE", "INSERT") if tabla == "memoria_proyectos" else ("DELETE", "UPDATE")
+        for evento in eventos:
+            _ejecutar_script(conn, f"""
+                CREATE TRIGGER IF NOT EXISTS {tabla}_version_{evento.lower()} AFTER {evento} ON {tabla} BEGIN
+                    INSERT INTO contadores (nombre, valor) VALUES ('modificaciones_{tabla}', 1)
+                        ON CONFLICT (nombre) DO UPDATE SET valor = valor + 1;
+                END;
+            """)
+
+def _migracion_9(conn):
+    """Métricas de la instrumentación opcional (CRONOS_PERF=guardar) y errores silenciados."""
+    _ejecutar_script(conn, """
+        CREATE TABLE IF NOT EXISTS metricas_operaciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            operacion TEXT NOT NULL,
+            duracion_ms REAL NOT NULL,
+            conexiones INTEGER NOT NULL,
+            sentencias INTEGER NOT NULL,
+            instrucciones INTEGER NOT NULL,
+            bytes_leidos INTEGER NOT NULL,
+            fallos_pagina INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS metricas_sentencias (
+            sql TEXT PRIMARY KEY,
+            ejecuciones INTEGER NOT NULL,
+            total_ms REAL NOT NULL,
+            maximo_ms REAL NOT NULL,
+            filas INTEGER NOT NULL,
+            instrucciones INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS errores_silenciados (
+            origen TEXT PRIMARY KEY,
+            total INTEGER NOT NULL,
+            ultimo_mensaje TEXT,
+            ultimo DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+def _migracion_10(conn):
+    """Limpia el índice FTS de memoria_proyectos tras los INSERT OR REPLACE, que no disparaban su trigger de borrado."""
+    # memoria_proyectos se escribe ahora con un upsert (dispara los triggers de actualización): las inserciones
+    # ya no necesitan contarse como modificaciones.
+    conn.execute("DROP TRIGGER IF EXISTS memoria_proyectos_version_insert")
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'memoria_fts'").fetchone():
+        conn.execute("INSERT INTO memoria_fts (memoria_fts) VALUES ('rebuild')")
+
+def _migracion_11(conn):
+    """Vacía la caché de búsquedas: ahora guarda los top_n de cada tabla y no solo el top_n global."""
+    conn.execute("DELETE FROM cache_busquedas")
+
+_MIGRACIONES = [_migracion_1, _migracion_2, _migracion_3, _migracion_4, _migracion_5, _migracion_6, _migracion_7, _migracion_8,
+                _migracion_9, _migracion_10, _migracion_11]
+ESQUEMA_VERSION = len(_MIGRACIONES)
+
+def _asegurar_esquema(conn):
+    """Aplica una sola vez, en orden, las migraciones pendientes según PRAGMA user_version."""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= ESQUEMA_VERSION:
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Se relee con el cerrojo de escritura tomado: otro proceso pudo migrar mientras tanto.
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for numero, migracion in enumerate(_MIGRACIONES[version:], start=version + 1):
+            migracion(conn)
+            conn.execute(f"PRAGMA user_version = {numero}")
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+# --- Instrumentación opcional (CRONOS_PERF): tiempos por sentencia, conexiones, E/S y errores silenciados ---
+
+# CRONOS_PERF=1 imprime un resumen en stderr al terminar; CRONOS_PERF=guardar lo acumula en la base de datos para --perf.
+PERF_MODO = os.environ.get("CRONOS_PERF", "")
+PERF_INSTRUCCIONES = 1000           # Instrucciones de la VM de SQLite entre llamadas al manejador de progreso.
+PERF_MAXIMO_OPERACIONES = 10000     # Operaciones conservadas en metricas_operaciones.
+PERF_LIMITE_INFORME = 10            # Operaciones y sentencias mostradas por --perf.
+PERF_ESPERA_ERRORES = 0.2           # Segundos de espera máxima al anotar un error silenciado (la base puede estar bloqueada).
+
+# Estado de la operación en curso (solo se mide con CRONOS_PERF).
+_perf = {"inicio": time.perf_counter(), "conexiones": 0, "sentencias": 0, "instrucciones": 0, "consultas": {}, "errores": {}}
+
+def _error_silenciado(origen, error):
+    """Anota en errores_silenciados, con o sin CRONOS_PERF, un error que se descarta a propósito (p. ej. en el gancho del prompt)."""
+    anotado = _perf["errores"].setdefault(origen, [0, ""])
+    anotado[0] += 1
+    anotado[1] = str(error)
+    # Conexión propia y espera corta: el error puede venir precisamente de un bloqueo, y el gancho no debe quedarse esperando.
+    try:
+        conn = sqlite3.connect(DB_PATH, timeout=PERF_ESPERA_ERRORES, isolation_level=None)
+        try:
+            conn.execute(
+                "INSERT INTO errores_silenciados (origen, total, ultimo_mensaje) VALUES (?, 1, ?) "
+                "ON CONFLICT (origen) DO UPDATE SET total = total + 1, ultimo_mensaje = excluded.ultimo_mensaje, "
+                "ultimo = CURRENT_TIMESTAMP",
+                (origen, str(error))
+            )
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        # Si tampoco se puede anotar, el error solo queda en el resumen de CRONOS_PERF=1.
+        pass
+
+def _sql_normalizada(sql):
+    """Agrupa las variantes de una sentencia: espacios colapsados y listas IN (?, ?, ...) reducidas a un marcador."""
+    return re.sub(r"IN \(\?(?:, \?)*\)", "IN (?)", " ".join(sql.split()))
+
+class _CursorMedido(sqlite3.Cursor):
+    """Cursor que acumula por sentencia el tiempo de ejecución y lectura, las filas devueltas y las instrucciones de la VM."""
+    _medida = None
+
+    def execute(self, sql, parametros=()):
+        return self._ejecutar(super().execute, sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self._ejecutar(super().executemany, sql, parametros)
+
+    def _ejecutar(self, metodo, sql, parametros):
+        # [ejecuciones, segundos totales, segundos de la ejecución más lenta, filas, instrucciones]
+        self._medida = _perf["consultas"].setdefault(_sql_normalizada(sql), [0, 0.0, 0.0, 0, 0])
+        self._medida[0] += 1
+        self._duracion = 0.0
+        return self._medir(metodo, sql, parametros)
+
+    def _medir(self, metodo, *args):
+        inicio, instrucciones = time.perf_counter(), _perf["instrucciones"]
+        resultado = None
+        try:
+            resultado = metodo(*args)
+            return resultado
+        finally:
+            if self._medida is not None:
+                transcurrido = time.perf_counter() - inicio
+                self._duracion += transcurrido
+                self._medida[1] += transcurrido
+                self._medida[2] = max(self._medida[2], self._duracion)
+                self._medida[3] += len(resultado) if isinstance(resultado, list) else isinstance(resultado, tuple)
+                self._medida[4] += _perf["instrucciones"] - instrucciones
+
+    def fetchone(self):
+        return self._medir(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._medir(super().fetchmany, size if size is not None else self.arraysize)
+
+    def fetchall(self):
+        return self._medir(super().fetchall)
+
+    def __next__(self):
+        return self._medir(super().__next__)
+
+class _ConexionMedida(sqlite3.Connection):
+    """Conexión cuyos cursores, también los implícitos de execute(), miden cada sentencia."""
+
+    def cursor(self, factory=_CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+def _instrumentar(conn):
+    """Cuenta las sentencias ejecutadas (también las de scripts y triggers) y, aproximadamente, las instrucciones de la VM."""
+    def traza(sql):
+        _perf["sentencias"] += 1
+
+    def progreso():
+        _perf["instrucciones"] += PERF_INSTRUCCIONES
+        return 0
+
+    conn.set_trace_callback(traza)
+    conn.set_progress_handler(progreso, PERF_INSTRUCCIONES)
+
+def _lecturas_proceso():
+    """Bytes leídos del almacenamiento (/proc/self/io, 0 si no está disponible) y fallos de página mayores del proceso."""
+    # Con mmap_size las páginas de la base de datos se leen por fallos de página, no con read().
+    bytes_leidos = 0
+    try:
+        with open("/proc/self/io") as f:
+            for linea in f:
+                if linea.startswith("read_bytes:"):
+                    bytes_leidos = int(linea.split()[1])
+    except (OSError, ValueError):
+        # Android restringe /proc/self/io en algunos dispositivos.
+        pass
+    return bytes_leidos, resource.getrusage(resource.RUSAGE_SELF).ru_majflt
+
+def _nombre_operacion():
+    """Nombre de la operación en curso para las métricas: la opción de la línea de comandos o el registro de un evento."""
+    args = sys.argv[1:]
+    if args and args[0].startswith("--"):
+        return args[0]
+    return "registrar_evento" if args else os.path.basename(sys.argv[0])
+
+def _resumen_perf():
+    """Métricas de la operación en curso: duración, conexiones, sentencias, instrucciones y lecturas desde el inicio."""
+    bytes_leidos, fallos = _lecturas_proceso()
+    return {
+        "operacion": _nombre_operacion(),
+        "duracion_ms": (time.perf_counter() - _perf["inicio"]) * 1000,
+        "conexiones": _perf["conexiones"],
+        "sentencias": _perf["sentencias"],
+        "instrucciones": _perf["instrucciones"],
+        "bytes_leidos": bytes_leidos - _perf["lecturas_iniciales"][0],
+        "fallos_pagina": fallos - _perf["lecturas_iniciales"][1]
+    }
+
+def _guardar_perf(resumen):
+    """Acumula las métricas de la operación en las tablas de métricas, con una conexión propia sin instrumentar."""
+    conn = sqlite3.connect(DB_PATH, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO metricas_operaciones (operacion, duracion_ms, conexiones, sentencias, instrucciones, bytes_leidos, fallos_pagina) "
+            "VALUES (:operacion, :duracion_ms, :conexiones, :sentencias, :instrucciones, :bytes_leidos, :fallos_pagina)",
+            resumen
+        )
+        conn.execute("DELETE FROM metricas_operaciones WHERE id <= (SELECT MAX(id) FROM metricas_operaciones) - ?",
+                     (PERF_MAXIMO_OPERACIONES,))
+        conn.executemany(
+            "INSERT INTO metricas_sentencias (sql, ejecuciones, total_ms, maximo_ms, filas, instrucciones) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (sql) DO UPDATE SET ejecuciones = ejecuciones + excluded.ejecuciones, total_ms = total_ms + excluded.total_ms, "
+            "maximo_ms = MAX(maximo_ms, excluded.maximo_ms), filas = filas + excluded.filas, "
+            "instrucciones = instrucciones + excluded.instrucciones",
+            [(sql, n, total * 1000, maximo * 1000, filas, instrucciones)
+             for sql, (n, total, maximo, filas, instrucciones) in _perf["consultas"].items()]
         )
-        conn.commit()
+        conn.execute("COMMIT")
+    finally:
         conn.close()
+
+def _imprimir_perf(resumen):
+    """Imprime en stderr el resumen de la operación y sus sentencias más costosas."""
+    print(f"--- [ CRONOS_PERF: {resumen['operacion']} ] ---", file=sys.stderr)
+    print(f"Duración: {resumen['duracion_ms']:.2f} ms | Conexiones: {resumen['conexiones']} | Sentencias: {resumen['sentencias']} | "
+          f"Instrucciones VM: ~{resumen['instrucciones']} | Leídos: {resumen['bytes_leidos']} bytes | "
+          f"Fallos de página: {resumen['fallos_pagina']}", file=sys.stderr)
+    consultas = sorted(_perf["consultas"].items(), key=lambda x: x[1][1], reverse=True)
+    for sql, (n, total, maximo, filas, _) in consultas[:5]:
+        print(f"  {total * 1000:9.2f} ms  {n:>6}x  máx {maximo * 1000:8.2f} ms  {filas:>7} filas  {sql[:100]}", file=sys.stderr)
+    for origen, (n, mensaje) in _perf["errores"].items():
+        print(f"  Error silenciado en {origen} ({n}): {mensaje}", file=sys.stderr)
+
+def _cerrar_perf():
+    """Al terminar el proceso, imprime (CRONOS_PERF=1) o guarda (CRONOS_PERF=guardar) las métricas de la operación."""
+    resumen = _resumen_perf()
+    if PERF_MODO == "guardar":
+        try:
+            _guardar_perf(resumen)
+        except sqlite3.Error as e:
+            print(f"Error al guardar las métricas de rendimiento: {e}", file=sys.stderr)
+    else:
+        _imprimir_perf(resumen)
+
+if PERF_MODO:
+    _perf["lecturas_iniciales"] = _lecturas_proceso()
+    # Se registra antes que cerrar_conexion(): atexit la ejecuta después, con todas las sentencias ya medidas.
+    atexit.register(_cerrar_perf)
+
+# Parámetros de la conexión compartida.
+SQLITE_BUSY_TIMEOUT = 5.0                # Segundos de espera ante un bloqueo antes de fallar.
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024     # Lecturas mapeadas en memoria.
+SQLITE_CACHE_KB = 16 * 1024              # Caché de páginas por conexión.
+SQLITE_SENTENCIAS_EN_CACHE = 256         # Sentencias preparadas reutilizadas.
+
+_conexion_compartida = None
+_ruta_conexion = None
+
+def _obtener_conexion():
+    """Devuelve la conexión del proceso a la bitácora, abriéndola en modo WAL con los pragmas ajustados la primera vez."""
+    global _conexion_compartida, _ruta_conexion
+    if _conexion_compartida is not None and _ruta_conexion == DB_PATH:
+        return _conexion_compartida
+    cerrar_conexion()
+
+    # Modo autocommit: cada sentencia suelta se confirma sola y transaccion() agrupa las que deban ir juntas.
+    conn = sqlite3.connect(DB_PATH, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None,
+                           cached_statements=SQLITE_SENTENCIAS_EN_CACHE,
+                           factory=_ConexionMedida if PERF_MODO else sqlite3.Connection)
+    _perf["conexiones"] += 1
+    if PERF_MODO:
+        _instrumentar(conn)
+    # WAL: los lectores (--revisar, búsquedas) nunca bloquean a los escritores ni al revés.
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_KB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    _asegurar_esquema(conn)
+
+    if _ruta_conexion is None:
+        atexit.register(cerrar_conexion)
+    _conexion_compartida = conn
+    _ruta_conexion = DB_PATH
+    return conn
+
+def cerrar_conexion():
+    """Cierra la conexión compartida del proceso, si está abierta."""
+    global _conexion_compartida
+    if _conexion_compartida is not None:
+        _conexion_compartida.close()
+        _conexion_compartida = None
+
+@contextlib.contextmanager
+def transaccion():
+    """Agrupa varias operaciones en una sola transacción; las transacciones anidadas se integran en la exterior."""
+    conn = _obtener_conexion()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def registrar_evento(comando, indexar=True):
+    """Registra un nuevo comando en la tabla eventos_sistema (indexar=False difiere el índice ANN a la próxima búsqueda)."""
+    directorio_actual = os.getcwd()
+    sesion_id = os.getenv('TERMUX_SESSION_ID', 'default_session')
+    if _enviar_al_demonio("evento", directorio_actual, comando, sesion_id):
+        return
+
+    try:
+        embedding = _generate_simple_embedding(comando)
+        with transaccion() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO eventos_sistema (directorio, comando, sesion_id, embedding_vector, embedding_version) VALUES (?, ?, ?, ?, ?)",
+                (directorio_actual, comando, sesion_id, embedding, EMBEDDING_VERSION)
+            )
+        if indexar:
+            _actualizar_indice_tras_insercion(cursor, "eventos_sistema")
     except sqlite3.Error as e:
-        pass
+        _error_silenciado("registrar_evento", e)
 
-def revisar_ultima_actividad():
-    """Muestra los últimos 10 eventos registrados en la bitácora."""
+def revisar_ultima_actividad(incluir_archivo=False, desde=None, hasta=None):
+    """Muestra los últimos 10 eventos registrados en la bitácora (con un intervalo de fechas o incluir_archivo, también los archivados)."""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = _obtener_conexion()
         cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT timestamp, directorio, comando FROM eventos_sistema ORDER BY timestamp DESC LIMIT 10"
-        )
-        
-        eventos = cursor.fetchall()
+        # Los archivos mensuales solo se adjuntan si se piden explícitamente o con un intervalo de fechas.
+        archivo = incluir_archivo or bool(desde or hasta)
+        condiciones, params = _condiciones_intervalo(desde, hasta)
+
+        def ultimas(tabla, columnas):
+            filas = _filas_recientes(cursor, tabla, ("id", "timestamp") + columnas, condiciones, params, 10, archivo, desde, hasta)
+            return [fila[1:] for fila in filas]
+
+        eventos = ultimas("eventos_sistema", ("directorio", "comando"))
         
         print("--- [ Bitácora Cronos: Última Actividad Registrada (Eventos del Sistema) ] ---")
         if not eventos:
@@ -87,10 +660,7 @@ def revisar_ultima_actividad():
                 print(f"[{timestamp}] [{directorio}]> {comando}")
         print("------------------------------------------------------------------------------")
 
-        cursor.execute(
-            "SELECT timestamp, autor, texto FROM conversaciones ORDER BY timestamp DESC LIMIT 10"
-        )
-        conversaciones = cursor.fetchall()
+        conversaciones = ultimas("conversaciones", ("autor", "texto"))
 
         print("\n--- [ Bitácora Cronos: Últimas Conversaciones ] ---")
         if not conversaciones:
@@ -101,10 +671,7 @@ def revisar_ultima_actividad():
                 print(f"[{timestamp}] ({autor}): {texto}")
         print("----------------------------------------------------")
 
-        cursor.execute(
-            "SELECT timestamp, proyecto, clave, valor FROM memoria_proyectos ORDER BY timestamp DESC LIMIT 10"
-        )
-        memoria_proyectos = cursor.fetchall()
+        memoria_proyectos = ultimas("memoria_proyectos", ("proyecto", "clave", "valor"))
 
         print("\n--- [ Bitácora Cronos: Última Memoria de Proyectos ] ---")
         if not memoria_proyectos:
@@ -115,11 +682,65 @@ def revisar_ultima_actividad():
                 print(f"[{timestamp}] [Proyecto: {proyecto}] [Clave: {clave}]: {valor}")
         print("--------------------------------------------------------")
 
-        conn.close()
-
     except sqlite3.Error as e:
         print(f"Error al consultar la Bitácora Cronos: {e}")
 
+# Tablas navegables con --explorar: tabla, columnas, filtros admitidos (opción -> columna) y formato de texto.
+_TABLAS_EXPLORAR = {
+    "eventos": ("eventos_sistema", ("id", "timestamp", "sesion_id", "directorio", "comando"),
+                {"sesion": "sesion_id", "directorio": "directorio"},
+                "[{timestamp}] [{directorio}]> {comando}"),
+    "conversaciones": ("conversaciones", ("id", "timestamp", "sesion_id", "autor", "texto"),
+                       {"sesion": "sesion_id", "autor": "autor"},
+                       "[{timestamp}] ({autor}): {texto}"),
+    "memoria": ("memoria_proyectos", ("id", "timestamp", "proyecto", "clave", "valor"),
+                {"proyecto": "proyecto"},
+                "[{timestamp}] [Proyecto: {proyecto}] [Clave: {clave}]: {valor}"),
+    "tareas": ("tareas_omnicompute", ("id", "timestamp", "task_id", "description", "platform", "status", "start_time", "end_time"),
+               {"status": "status"},
+               "[{timestamp}] [ID: {task_id}] [Plataforma: {platform}] [Estado: {status}] {description}")
+}
+
+def explorar_actividad(nombre, filtros=None, desde=None, hasta=None, limite=50, antes=None, jsonl=False, incluir_archivo=False):
+    """Recorre una tabla de la más reciente a la más antigua con paginación por clave (timestamp, id), en memoria constante."""
+    tabla, columnas, admitidos, formato = _TABLAS_EXPLORAR[nombre]
+    # Los archivos mensuales solo se recorren si se piden o con un intervalo de fechas.
+    archivo = incluir_archivo or bool(desde or hasta)
+    condiciones, params = _condiciones_intervalo(desde, hasta)
+    for opcion, valor in (filtros or {}).items():
+        condiciones.append(f"{admitidos[opcion]} = ?")
+        params.append(valor)
+    pagina = None
+    if antes:
+        # El cursor de página es el (timestamp, id) de la última fila mostrada; no hay OFFSET que recorrer.
+        marca, _, ultimo_id = antes.rpartition("|")
+        pagina = (marca, int(ultimo_id))
+        # El cursor vale en todas las fuentes (los ids archivados son los originales); los meses posteriores se omiten.
+        hasta = min(hasta or marca, marca)
+
+    try:
+        cursor = _obtener_conexion().cursor()
+        ultima = None
+        mostradas = 0
+        for fila in _filas_recientes(cursor, tabla, columnas, condiciones, params, limite, archivo, desde, hasta, pagina):
+            registro = dict(zip(columnas, fila))
+            if jsonl:
+                sys.stdout.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            else:
+                print(formato.format(**registro))
+            ultima = registro
+            mostradas += 1
+
+        # En modo JSONL los avisos van a stderr para no contaminar la salida encadenada.
+        salida = sys.stderr if jsonl else sys.stdout
+        if limite and mostradas == limite:
+            print(f"Siguiente página: --antes '{ultima['timestamp']}|{ultima['id']}'", file=salida)
+        elif not mostradas:
+            print("No hay registros que coincidan.", file=salida)
+
+    except sqlite3.Error as e:
+        print(f"Error al explorar la Bitácora Cronos: {e}", file=sys.stderr)
+
 def guardar_conversacion(autor, texto):
     """Guarda una conversación en la bitácora de forma automática."""
     try:
@@ -127,23 +748,23 @@ def guardar_conversacion(autor, texto):
             # print("Autor o texto inválido. Abortando.") # Desactivado para evitar spam en la salida
             return
 
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
         sesion_id = os.getenv('TERMUX_SESSION_ID', 'default_session')
-        embedding = _generate_simple_embedding(texto)
+        if _enviar_al_demonio("conversacion", sesion_id, autor, texto):
+            return
 
-        cursor.execute(
-            "INSERT INTO conversaciones (sesion_id, autor, texto, embedding_vector) VALUES (?, ?, ?, ?)",
-            (sesion_id, autor, texto, embedding)
-        )
-        conn.commit()
-        conn.close()
+        embedding = _generate_simple_embedding(texto)
+        with transaccion() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO conversaciones (sesion_id, autor, texto, embedding_vector, embedding_version) VALUES (?, ?, ?, ?, ?)",
+                (sesion_id, autor, texto, embedding, EMBEDDING_VERSION)
+            )
+        _actualizar_indice_tras_insercion(cursor, "conversaciones")
         # print("Conversación guardada en la Bitácora Cronos.") # Desactivado para evitar spam en la salida
 
     except sqlite3.Error as e:
         # print(f"Error al guardar la conversación: {e}") # Desactivado para evitar spam en la salida
-        pass
+        _error_silenciado("guardar_conversacion", e)
 
 def guardar_conversacion_cli():
     """Función para guardar conversación desde la línea de comandos (interactiva)."""
@@ -154,27 +775,89 @@ def guardar_conversacion_cli():
     texto = sys.stdin.readline().strip()
     guardar_conversacion(autor, texto)
 
-def analizar_comportamientos_sistema():
+# Ventanas temporales del análisis (modificador de fecha de SQLite).
+VENTANAS_ANALISIS = {
+    "hora": "-1 hours",
+    "dia": "-1 days",
+    "semana": "-7 days"
+}
+
+def _actualizar_rollups(conn):
+    """Incorpora a los agregados por hora y sesión los eventos nuevos desde el último id procesado."""
+    with transaccion():
+        fila = conn.execute("SELECT ultimo_id FROM rollup_estado WHERE nombre = 'eventos_sistema'").fetchone()
+        desde = fila[0] if fila else 0
+        normalizados = _eventos_normalizados(conn.cursor())
+        hasta = conn.execute(f"SELECT MAX(id) FROM {'eventos_norm' if normalizados else 'eventos_sistema'}").fetchone()[0] or 0
+        if hasta <= desde:
+            return 0
+
+        for tabla, columna, diccionario in (("rollup_comandos", "comando", "comandos"), ("rollup_directorios", "directorio", "directorios")):
+            if normalizados:
+                # Se agrupa por el id entero y solo se resuelve el texto de cada grupo.
+                consulta = (
+                    f"SELECT g.hora, g.sesion, COALESCE(d.{columna}, ''), g.total FROM ("
+                    f"SELECT strftime('%Y-%m-%d %H:00:00', timestamp) AS hora, COALESCE(sesion_id, '') AS sesion, "
+                    f"{columna}_id AS ref, COUNT(*) AS total FROM eventos_norm WHERE id > ? AND id <= ? GROUP BY 1, 2, 3"
+                    f") g LEFT JOIN {diccionario} d ON d.id = g.ref WHERE true"
+                )
+            else:
+                consulta = (
+                    f"SELECT strftime('%Y-%m-%d %H:00:00', timestamp), COALESCE(sesion_id, ''), COALESCE({columna}, ''), COUNT(*) "
+                    f"FROM eventos_sistema WHERE id > ? AND id <= ? GROUP BY 1, 2, 3"
+                )
+            conn.execute(
+                f"INSERT INTO {tabla} (hora, sesion_id, {columna}, total) {consulta} "
+                f"ON CONFLICT (hora, sesion_id, {columna}) DO UPDATE SET total = total + excluded.total",
+                (desde, hasta)
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO rollup_estado (nombre, ultimo_id) VALUES ('eventos_sistema', ?)",
+            (hasta,)
+        )
+        return hasta - desde
+
+def _mas_frecuentes(cursor, tabla, columna, ventana, sesion_id, limite=5):
+    """Devuelve los valores más frecuentes de un agregado, opcionalmente acotados por ventana y sesión."""
+    condiciones, params = [], []
+    if ventana:
+        condiciones.append("hora >= strftime('%Y-%m-%d %H:00:00', 'now', ?)")
+        params.append(VENTANAS_ANALISIS[ventana])
+    if sesion_id:
+        condiciones.append("sesion_id = ?")
+        params.append(sesion_id)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    cursor.execute(
+        f"SELECT {columna}, SUM(total) as count FROM {tabla} {where} GROUP BY {columna} ORDER BY count DESC LIMIT ?",
+        params + [limite]
+    )
+    return cursor.fetchall()
+
+def analizar_comportamientos_sistema(ventana=None, sesion_id=None):
     """Analiza los eventos del sistema para identificar patrones y guarda insights en memoria_proyectos."""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = _obtener_conexion()
         cursor = conn.cursor()
 
+        # Solo se agregan los eventos nuevos; las consultas leen de los agregados, no de eventos_sistema.
+        _actualizar_rollups(conn)
+        sufijo = "".join(f"_{parte}" for parte in (ventana, sesion_id) if parte)
+
         # Comandos más frecuentes
-        cursor.execute("SELECT comando, COUNT(*) as count FROM eventos_sistema GROUP BY comando ORDER BY count DESC LIMIT 5")
-        comandos_frecuentes = cursor.fetchall()
-        if comandos_frecuentes:
-            insight_comandos = "Comandos más frecuentes: " + ", ".join([f"'{cmd}' ({count})" for cmd, count in comandos_frecuentes])
-            guardar_memoria_proyecto("sistema_comportamiento", "comandos_frecuentes", insight_comandos)
+        comandos_frecuentes = _mas_frecuentes(cursor, "rollup_comandos", "comando", ventana, sesion_id)
 
         # Directorios más utilizados
-        cursor.execute("SELECT directorio, COUNT(*) as count FROM eventos_sistema GROUP BY directorio ORDER BY count DESC LIMIT 5")
-        directorios_frecuentes = cursor.fetchall()
-        if directorios_frecuentes:
-            insight_directorios = "Directorios más utilizados: " + ", ".join([f"'{dir}' ({count})" for dir, count in directorios_frecuentes])
-            guardar_memoria_proyecto("sistema_comportamiento", "directorios_frecuentes", insight_directorios)
+        directorios_frecuentes = _mas_frecuentes(cursor, "rollup_directorios", "directorio", ventana, sesion_id)
+
+        # Las lecturas van fuera de la transacción; los insights se guardan juntos en una sola.
+        with transaccion():
+            if comandos_frecuentes:
+                insight_comandos = "Comandos más frecuentes: " + ", ".join([f"'{cmd}' ({count})" for cmd, count in comandos_frecuentes])
+                guardar_memoria_proyecto("sistema_comportamiento", f"comandos_frecuentes{sufijo}", insight_comandos)
+            if directorios_frecuentes:
+                insight_directorios = "Directorios más utilizados: " + ", ".join([f"'{dir}' ({count})" for dir, count in directorios_frecuentes])
+                guardar_memoria_proyecto("sistema_comportamiento", f"directorios_frecuentes{sufijo}", insight_directorios)
 
-        conn.close()
         print("Análisis de comportamientos del sistema completado y guardado en memoria_proyectos.")
 
     except sqlite3.Error as e:
@@ -185,7 +868,7 @@ def analizar_comportamientos_sistema():
 def generar_y_guardar_resumen(entry_type, entry_id):
     """Genera un resumen básico de una entrada (evento o conversación) y lo guarda en memoria_proyectos."""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = _obtener_conexion()
         cursor = conn.cursor()
         text_to_summarize = ""
         project_name = f"resumen_{entry_type}_{entry_id}"
@@ -212,8 +895,6 @@ def generar_y_guardar_resumen(entry_type, entry_id):
         else:
             print(f"No se encontró texto para {entry_type} ID {entry_id}.")
 
-        conn.close()
-
     except sqlite3.Error as e:
         print(f"Error al generar o guardar resumen: {e}")
     except Exception as e:
@@ -222,15 +903,20 @@ def generar_y_guardar_resumen(entry_type, entry_id):
 def guardar_memoria_proyecto(proyecto, clave, valor):
     """Guarda o actualiza una entrada en la tabla memoria_proyectos."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
         embedding = _generate_simple_embedding(valor)
-        cursor.execute(
-            "INSERT OR REPLACE INTO memoria_proyectos (proyecto, clave, valor, embedding_vector) VALUES (?, ?, ?, ?)",
-            (proyecto, clave, valor, embedding)
-        )
-        conn.commit()
-        conn.close()
+        with transaccion() as conn:
+            cursor = conn.cursor()
+            # Un upsert conserva el id y dispara los triggers de actualización (FTS y caché); REPLACE borraría
+            # la fila sin disparar los de borrado.
+            cursor.execute(
+                "INSERT INTO memoria_proyectos (proyecto, clave, valor, embedding_vector, embedding_version) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (proyecto, clave) DO UPDATE SET valor = excluded.valor, embedding_vector = excluded.embedding_vector, "
+                "embedding_version = excluded.embedding_version, timestamp = CURRENT_TIMESTAMP",
+                (proyecto, clave, valor, embedding, EMBEDDING_VERSION)
+            )
+        if not conn.in_transaction:
+            # Dentro de una transacción exterior el índice se pone al día en la próxima búsqueda.
+            _actualizar_indice_tras_insercion(cursor, "memoria_proyectos")
         print(f"Memoria de proyecto '{proyecto}' - '{clave}' guardada/actualizada.")
     except sqlite3.Error as e:
         print(f"Error al guardar memoria de proyecto: {e}")
@@ -238,15 +924,13 @@ def guardar_memoria_proyecto(proyecto, clave, valor):
 def registrar_tarea_omnicompute(task_id, description, platform, status="PENDING"):
     """Registra una nueva tarea de Omni-Compute en la tabla tareas_omnicompute."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
         embedding = _generate_simple_embedding(description)
-        cursor.execute(
-            "INSERT INTO tareas_omnicompute (task_id, description, platform, status, start_time, embedding_vector) VALUES (?, ?, ?, ?, ?, ?)",
-            (task_id, description, platform, status, datetime.now().isoformat(), embedding)
-        )
-        conn.commit()
-        conn.close()
+        with transaccion() as conn:
+            conn.execute(
+                "INSERT INTO tareas_omnicompute (task_id, description, platform, status, start_time, embedding_vector, embedding_version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (task_id, description, platform, status, datetime.now().isoformat(), embedding, EMBEDDING_VERSION)
+            )
         print(f"Tarea Omni-Compute '{task_id}' registrada con estado '{status}'.")
         return True
     except sqlite3.Error as e:
@@ -254,41 +938,146 @@ def registrar_tarea_omnicompute(task_id, description, platform, status="PENDING"
         return False
 
 def actualizar_estado_tarea_omnicompute(task_id, status, output_log=None, error_log=None):
-    """Actualiza el estado y los logs de una tarea de Omni-Compute."""
+    """Actualiza el estado de una tarea de Omni-Compute y anexa los logs indicados como fragmentos comprimidos."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        update_query = "UPDATE tareas_omnicompute SET status = ?, end_time = ?"
-        params = [status, datetime.now().isoformat()]
-        if output_log:
-            update_query += ", output_log = ?"
-            params.append(output_log)
-        if error_log:
-            update_query += ", error_log = ?"
-            params.append(error_log)
-        update_query += " WHERE task_id = ?"
-        params.append(task_id)
-
-        cursor.execute(update_query, params)
-        conn.commit()
-        conn.close()
+        with transaccion() as conn:
+            conn.execute(
+                "UPDATE tareas_omnicompute SET status = ?, end_time = ? WHERE task_id = ?",
+                (status, datetime.now().isoformat(), task_id)
+            )
+            if output_log:
+                _anexar_fragmento(conn, task_id, "output", output_log.encode('utf-8'))
+            if error_log:
+                _anexar_fragmento(conn, task_id, "error", error_log.encode('utf-8'))
         print(f"Estado de tarea Omni-Compute '{task_id}' actualizado a '{status}'.")
         return True
     except sqlite3.Error as e:
         print(f"Error al actualizar estado de tarea Omni-Compute: {e}")
         return False
 
+# --- Logs de tareas: fragmentos zlib de solo anexado en tareas_log_chunks ---
+
+LOG_FRAGMENTO_BYTES = 64 * 1024   # Tamaño máximo de un fragmento antes de comprimirlo.
+LOG_INTERVALO = 1.0               # Segundos máximos que la salida espera antes de guardarse.
+LOG_COLA_LINEAS = 3               # Líneas finales mostradas en el listado de tareas.
+
+# Columnas heredadas donde los logs se guardaban completos antes de los fragmentos.
+_COLUMNAS_LOG = {"output": "output_log", "error": "error_log"}
+
+def _anexar_fragmento(conn, task_id, flujo, datos):
+    """Inserta un fragmento de log comprimido; el log existente nunca se reescribe."""
+    conn.execute(
+        "INSERT INTO tareas_log_chunks (task_id, flujo, bytes_originales, datos) VALUES (?, ?, ?, ?)",
+        (task_id, flujo, len(datos), zlib.compress(datos))
+    )
+
+def anexar_log_tarea(task_id, flujo, entrada):
+    """Anexa al log de una tarea lo que llega por un flujo binario, en fragmentos por tamaño o por tiempo."""
+    try:
+        pendiente = bytearray()
+        ultimo_volcado = time.monotonic()
+        total = 0
+        descriptor = entrada.fileno()
+        while True:
+            # Con datos pendientes se espera como mucho hasta que venza LOG_INTERVALO: si el productor se queda
+            # callado (una compilación colgada), lo recibido se guarda igualmente y sobrevive a que lo maten.
+            espera = max(0.0, ultimo_volcado + LOG_INTERVALO - time.monotonic()) if pendiente else None
+            listos, _, _ = select.select([descriptor], [], [], espera)
+            # os.read devuelve en cuanto hay datos, sin esperar a llenar un búfer; None indica que venció la espera.
+            datos = os.read(descriptor, LOG_FRAGMENTO_BYTES) if listos else None
+            if datos:
+                pendiente += datos
+            if pendiente and (not datos or len(pendiente) >= LOG_FRAGMENTO_BYTES
+                              or time.monotonic() - ultimo_volcado >= LOG_INTERVALO):
+                with transaccion() as conn:
+                    _anexar_fragmento(conn, task_id, flujo, bytes(pendiente))
+                total += len(pendiente)
+                pendiente.clear()
+                ultimo_volcado = time.monotonic()
+            if datos == b"":
+                break
+        print(f"Log '{flujo}' de la tarea '{task_id}': {total} bytes anexados.", file=sys.stderr)
+        return True
+    except sqlite3.Error as e:
+        print(f"Error al anexar log de tarea Omni-Compute: {e}", file=sys.stderr)
+        return False
+
+def _tamano_log(cursor, task_id, flujo):
+    """Devuelve el tamaño sin comprimir del log de una tarea (columna heredada más fragmentos)."""
+    cursor.execute(
+        f"SELECT COALESCE(length(CAST({_COLUMNAS_LOG[flujo]} AS BLOB)), 0) FROM tareas_omnicompute WHERE task_id = ? LIMIT 1",
+        (task_id,)
+    )
+    fila = cursor.fetchone()
+    heredado = fila[0] if fila else 0
+    cursor.execute(
+        "SELECT COALESCE(SUM(bytes_originales), 0) FROM tareas_log_chunks WHERE task_id = ? AND flujo = ?",
+        (task_id, flujo)
+    )
+    return heredado + cursor.fetchone()[0]
+
+def _cola_log(cursor, task_id, flujo, lineas):
+    """Devuelve las últimas líneas del log de una tarea descomprimiendo solo los fragmentos finales."""
+    partes = []
+    saltos = 0
+    cursor.execute(
+        "SELECT datos FROM tareas_log_chunks WHERE task_id = ? AND flujo = ? ORDER BY id DESC",
+        (task_id, flujo)
+    )
+    for (datos,) in cursor:
+        fragmento = zlib.decompress(datos)
+        partes.append(fragmento)
+        saltos += fragmento.count(b"\n")
+        if saltos > lineas:
+            break
+    else:
+        cursor.execute(
+            f"SELECT substr(CAST({_COLUMNAS_LOG[flujo]} AS BLOB), -?) FROM tareas_omnicompute WHERE task_id = ? LIMIT 1",
+            (LOG_FRAGMENTO_BYTES, task_id)
+        )
+        fila = cursor.fetchone()
+        if fila and fila[0]:
+            partes.append(fila[0])
+    texto = b"".join(reversed(partes)).decode('utf-8', errors='replace')
+    return "\n".join(texto.rstrip("\n").split("\n")[-lineas:])
+
+def leer_log_tarea(task_id, flujo="output", cola=None):
+    """Vuelca el log de una tarea fragmento a fragmento (o solo sus últimas líneas) sin cargarlo entero en memoria."""
+    try:
+        cursor = _obtener_conexion().cursor()
+        if cola is not None:
+            print(_cola_log(cursor, task_id, flujo, cola))
+            return
+
+        # Un decodificador incremental evita romper caracteres UTF-8 partidos entre fragmentos.
+        decodificador = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        cursor.execute(
+            f"SELECT CAST({_COLUMNAS_LOG[flujo]} AS BLOB) FROM tareas_omnicompute WHERE task_id = ? LIMIT 1",
+            (task_id,)
+        )
+        fila = cursor.fetchone()
+        if fila and fila[0]:
+            sys.stdout.write(decodificador.decode(fila[0]))
+        cursor.execute(
+            "SELECT datos FROM tareas_log_chunks WHERE task_id = ? AND flujo = ? ORDER BY id",
+            (task_id, flujo)
+        )
+        for (datos,) in cursor:
+            sys.stdout.write(decodificador.decode(zlib.decompress(datos)))
+        sys.stdout.write(decodificador.decode(b"", final=True))
+        sys.stdout.flush()
+    except sqlite3.Error as e:
+        print(f"Error al leer log de tarea Omni-Compute: {e}")
+
 def obtener_memoria_proyecto(proyecto, clave):
     """Obtiene el valor de una clave específica de la memoria de proyectos."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        cursor = _obtener_conexion().cursor()
         cursor.execute(
             "SELECT valor FROM memoria_proyectos WHERE proyecto = ? AND clave = ?",
             (proyecto, clave)
         )
         resultado = cursor.fetchone()
-        conn.close()
         if resultado:
             return resultado[0]
         return None
@@ -299,14 +1088,12 @@ def obtener_memoria_proyecto(proyecto, clave):
 def listar_memoria_proyecto(proyecto):
     """Lista todas las claves y valores para un proyecto específico en la memoria de proyectos."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        cursor = _obtener_conexion().cursor()
         cursor.execute(
             "SELECT clave, valor FROM memoria_proyectos WHERE proyecto = ?",
             (proyecto,)
         )
         resultados = cursor.fetchall()
-        conn.close()
         return resultados
     except sqlite3.Error as e:
         print(f"Error al listar memoria de proyecto: {e}")
@@ -315,73 +1102,853 @@ def listar_memoria_proyecto(proyecto):
 def eliminar_memoria_proyecto(proyecto, clave):
     """Elimina una entrada específica de la memoria de proyectos."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            "DELETE FROM memoria_proyectos WHERE proyecto = ? AND clave = ?",
-            (proyecto, clave)
-        )
-        conn.commit()
-        conn.close()
+        with transaccion() as conn:
+            conn.execute(
+                "DELETE FROM memoria_proyectos WHERE proyecto = ? AND clave = ?",
+                (proyecto, clave)
+            )
         print(f"Memoria de proyecto '{proyecto}' - '{clave}' eliminada.")
     except sqlite3.Error as e:
         print(f"Error al eliminar memoria de proyecto: {e}")
 
-def buscar_similitud(query_text, top_n=5):
-    """Busca entradas similares en eventos_sistema y conversaciones usando embeddings simplificados."""
+# Tablas consultadas por la búsqueda de similitud: etiqueta y expresión SQL del texto mostrado.
+_TABLAS_BUSQUEDA = {
+    "eventos_sistema": ("Evento", "comando"),
+    "conversaciones": ("Conversación", "texto"),
+    "memoria_proyectos": ("Memoria de Proyecto", "'[Proyecto: ' || proyecto || '] [Clave: ' || clave || ']: ' || valor")
+}
+
+# Con los eventos normalizados (--normalizar_eventos) el embedding se guarda una vez por comando distinto,
+# y la búsqueda recorre la tabla de comandos en lugar de eventos_sistema.
+_ETIQUETAS_BUSQUEDA = dict(_TABLAS_BUSQUEDA, comandos=("Comando", "comando"))
+
+def _eventos_normalizados(cursor):
+    """Indica si eventos_sistema es la vista sobre el almacenamiento normalizado (eventos_norm, comandos y directorios)."""
+    fila = cursor.connection.execute("SELECT type FROM main.sqlite_master WHERE name = 'eventos_sistema'").fetchone()
+    return fila is not None and fila[0] == 'view'
+
+def _tabla_embeddings(cursor, tabla):
+    """Devuelve la tabla que guarda los embeddings de 'tabla' (comandos, si los eventos están normalizados)."""
+    if tabla == "eventos_sistema" and _eventos_normalizados(cursor):
+        return "comandos"
+    return tabla
+
+def _tablas_buscadas(cursor):
+    """Tablas que recorre la búsqueda de similitud en la base caliente."""
+    normalizados = _eventos_normalizados(cursor)
+    return ["comandos" if normalizados and tabla == "eventos_sistema" else tabla for tabla in _TABLAS_BUSQUEDA]
+
+# Filas leídas de SQLite por lote al sincronizar la matriz de embeddings.
+_LOTE_SINCRONIZACION = 4096
+
+def _ruta_indice():
+    """Devuelve el directorio de ficheros auxiliares (matrices de embeddings) junto a la base de datos."""
+    return DB_PATH + ".vec"
+
+def _leer_meta_indice():
+    """Lee los metadatos del índice vectorial (filas, último id y versión de los embeddings sincronizados por tabla)."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        query_embedding = np.array(json.loads(_generate_simple_embedding(query_text)))
+        with open(os.path.join(_ruta_indice(), "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _guardar_meta_indice(meta):
+    """Escribe los metadatos del índice de forma atómica."""
+    ruta = os.path.join(_ruta_indice(), "meta.json")
+    with open(ruta + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(ruta + ".tmp", ruta)
+
+def _invalidar_indice():
+    """Elimina las matrices auxiliares; se reconstruirán en la próxima búsqueda."""
+    shutil.rmtree(_ruta_indice(), ignore_errors=True)
+
+def _reiniciar_matrices(tablas):
+    """Descarta las matrices (y códigos ANN) de las tablas indicadas para que se reconstruyan en la próxima búsqueda."""
+    if not os.path.isdir(_ruta_indice()):
+        return
+    with open(os.path.join(_ruta_indice(), "lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        meta = _leer_meta_indice()
+        for tabla in tablas:
+            meta.pop(tabla, None)
+        _guardar_meta_indice(meta)
+
+def _sincronizar_matriz(cursor, tabla, meta):
+    """Añade a la matriz de la tabla los embeddings (normalizados) de las filas nuevas desde el último id."""
+    estado = meta.get(tabla, {"filas": 0, "ultimo_id": 0})
+    cursor.execute(f"SELECT MAX(id) FROM {tabla}")
+    max_id = cursor.fetchone()[0] or 0
+
+    # Los triggers {tabla}_version_* cuentan borrados y cambios: un cambio deja en la matriz el vector anterior de la fila.
+    cursor.execute("SELECT valor FROM contadores WHERE nombre = ?", (f"modificaciones_{tabla}",))
+    fila = cursor.fetchone()
+    modificaciones = fila[0] if fila else 0
+
+    # Sin metadatos, con un max_id menor que el sincronizado (base de datos recreada) o con vectores de otra
+    # EMBEDDING_VERSION, se reconstruye desde cero. El recálculo posterior de cada fragmento cuenta como modificación.
+    reconstruir = (tabla not in meta or max_id < estado["ultimo_id"] or estado.get("version") != EMBEDDING_VERSION
+                   or modificaciones != estado.get("modificaciones", modificaciones))
+    if reconstruir:
+        estado = {"filas": 0, "ultimo_id": 0}  # También descarta los códigos LSH derivados.
+    estado["modificaciones"] = modificaciones
+    estado["version"] = EMBEDDING_VERSION
+
+    ruta_vec = os.path.join(_ruta_indice(), f"{tabla}.f32")
+    ruta_ids = os.path.join(_ruta_indice(), f"{tabla}.ids")
+    # Una reconstrucción se escribe aparte y sustituye los ficheros de golpe: otra búsqueda puede tener
+    # mapeada la matriz anterior, y truncarla en el sitio le provocaría un SIGBUS.
+    sufijo, modo = (".tmp", "wb") if reconstruir else ("", "ab")
+    with open(ruta_vec + sufijo, modo) as f_vec, open(ruta_ids + sufijo, modo) as f_ids:
+        # Descarta cualquier escritura parcial posterior a los últimos metadatos confirmados.
+        f_vec.truncate(estado["filas"] * EMBEDDING_BYTES)
+        f_ids.truncate(estado["filas"] * 8)
+
+        if max_id > estado["ultimo_id"]:
+            # Las filas con embeddings JSON anteriores al formato binario no entran en la matriz: se cuentan para avisar.
+            cursor.execute(f"SELECT COUNT(*) FROM {tabla} WHERE id > ? AND id <= ? AND typeof(embedding_vector) = 'text'",
+                           (estado["ultimo_id"], max_id))
+            estado["json"] = estado.get("json", 0) + cursor.fetchone()[0]
+            cursor.execute(
+                f"SELECT id, embedding_vector FROM {tabla} WHERE id > ? AND id <= ? AND typeof(embedding_vector) = 'blob' "
+                f"AND embedding_version = ? ORDER BY id",
+                (estado["ultimo_id"], max_id, EMBEDDING_VERSION)
+            )
+            while True:
+                filas = cursor.fetchmany(_LOTE_SINCRONIZACION)
+                if not filas:
+                    break
+                matriz = _decode_embeddings([emb for _, emb in filas])
+                normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+                normas[normas == 0] = 1.0
+                f_vec.write((matriz / normas).astype(EMBEDDING_DTYPE).tobytes())
+                f_ids.write(np.asarray([row_id for row_id, _ in filas], dtype='<i8').tobytes())
+                estado["filas"] += len(filas)
+            estado["ultimo_id"] = max_id
+
+    if reconstruir:
+        os.replace(ruta_vec + sufijo, ruta_vec)
+        os.replace(ruta_ids + sufijo, ruta_ids)
+    meta[tabla] = estado
+    return estado
+
+def _cargar_matriz(tabla, filas):
+    """Abre la matriz normalizada y los ids de una tabla como memoria mapeada (sin copiarlos)."""
+    if filas == 0:
+        return np.empty((0, EMBEDDING_DIM), dtype=EMBEDDING_DTYPE), np.empty(0, dtype='<i8')
+    matriz = np.memmap(os.path.join(_ruta_indice(), f"{tabla}.f32"), dtype=EMBEDDING_DTYPE, mode='r', shape=(filas, EMBEDDING_DIM))
+    ids = np.memmap(os.path.join(_ruta_indice(), f"{tabla}.ids"), dtype='<i8', mode='r', shape=(filas,))
+    return matriz, ids
+
+def _sincronizar_indice(cursor, tablas):
+    """Pone al día las matrices (y el índice ANN, si está activo) de las tablas indicadas bajo un cerrojo de fichero."""
+    os.makedirs(_ruta_indice(), exist_ok=True)
+    with open(os.path.join(_ruta_indice(), "lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        meta = _leer_meta_indice()
+        for tabla in tablas:
+            estado = _sincronizar_matriz(cursor, tabla, meta)
+            if _ann_activo():
+                _sincronizar_ann(tabla, estado)
+        _guardar_meta_indice(meta)
+    return meta
+
+def _actualizar_indice_tras_insercion(cursor, tabla):
+    """Incorpora al índice ANN las filas recién insertadas, si el índice está activo."""
+    if not _ann_activo():
+        return
+    try:
+        _sincronizar_indice(cursor, [_tabla_embeddings(cursor, tabla)])
+    except OSError as e:
+        # El índice se pondrá al día en la próxima búsqueda desde el último id sincronizado.
+        _error_silenciado("_actualizar_indice_tras_insercion", e)
+
+# --- Índice ANN: LSH por proyecciones aleatorias, con varias tablas hash ordenadas ---
+
+ANN_TABLAS = 4         # Tablas hash independientes (más tablas = más recall, más candidatos).
+ANN_BITS = 16          # Bits por código LSH.
+ANN_RADIO = 1          # Radio de Hamming sondeado por defecto (perilla recall/latencia).
+ANN_COLA_MINIMA = 4096 # Filas sin ordenar toleradas antes de reordenar los códigos.
+
+_ann_cache = {}
+
+def _ann_activo():
+    """Indica si el índice ANN está activado para esta base de datos."""
+    return os.path.exists(os.path.join(_ruta_indice(), "ann.npz"))
+
+def _ann_parametros():
+    """Carga (una vez por proceso) los hiperplanos y el centro de las proyecciones LSH."""
+    ruta = os.path.join(_ruta_indice(), "ann.npz")
+    if ruta not in _ann_cache:
+        with np.load(ruta) as datos:
+            planos = datos["planos"].reshape(ANN_TABLAS * ANN_BITS, EMBEDDING_DIM)
+            _ann_cache[ruta] = (planos, datos["centro"])
+    return _ann_cache[ruta]
+
+def _ann_codigos(matriz):
+    """Calcula los códigos LSH (N x ANN_TABLAS, uint32) de una matriz de embeddings normalizados."""
+    planos, centro = _ann_parametros()
+    bits = ((matriz - centro) @ planos.T > 0).reshape(len(matriz), ANN_TABLAS, ANN_BITS)
+    pesos = (1 << np.arange(ANN_BITS, dtype=np.uint32))
+    return (bits * pesos).sum(axis=2, dtype=np.uint32)
+
+def _popcount(valores):
+    """Cuenta los bits activos de cada elemento de un array uint32."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(valores)
+    bytes_ = valores.astype('<u4').view(np.uint8).reshape(valores.shape + (4,))
+    return np.unpackbits(bytes_, axis=-1).sum(axis=-1)
+
+def _sincronizar_ann(tabla, estado):
+    """Calcula los códigos LSH de las filas nuevas de la matriz y reordena las tablas hash cuando la cola crece."""
+    ruta_cod = os.path.join(_ruta_indice(), f"{tabla}.lsh")
+    codigos = estado.get("codigos", 0)
+    ordenadas = estado.get("ordenadas", 0)
+    if codigos > estado["filas"]:
+        codigos = ordenadas = 0  # La matriz se reconstruyó.
+
+    with open(ruta_cod, "ab") as f_cod:
+        f_cod.truncate(codigos * ANN_TABLAS * 4)
+        if codigos < estado["filas"]:
+            matriz, _ = _cargar_matriz(tabla, estado["filas"])
+            for inicio in range(codigos, estado["filas"], _LOTE_SINCRONIZACION):
+                f_cod.write(_ann_codigos(matriz[inicio:inicio + _LOTE_SINCRONIZACION]).astype('<u4').tobytes())
+            codigos = estado["filas"]
+
+    # Las filas ya ordenadas se consultan con búsqueda binaria; la cola se recorre linealmente.
+    if codigos - ordenadas > max(ANN_COLA_MINIMA, codigos // 10):
+        todos = np.fromfile(ruta_cod, dtype='<u4', count=codigos * ANN_TABLAS).reshape(codigos, ANN_TABLAS)
+        orden = np.argsort(todos, axis=0, kind='stable').T.astype('<u4')
+        ordenados = np.take_along_axis(todos, orden.T.astype(np.intp), axis=0).T
+        for nombre, datos in (("lsh_orden", orden), ("lsh_ordenados", ordenados)):
+            ruta = os.path.join(_ruta_indice(), f"{tabla}.{nombre}")
+            np.ascontiguousarray(datos).tofile(ruta + ".tmp")
+            os.replace(ruta + ".tmp", ruta)
+        ordenadas = codigos
+
+    estado["codigos"] = codigos
+    estado["ordenadas"] = ordenadas
+
+def activar_indice_ann(semilla=0):
+    """Activa el índice ANN: genera los hiperplanos LSH y calcula los códigos de todas las filas existentes."""
+    try:
+        cursor = _obtener_conexion().cursor()
+        tablas = _tablas_buscadas(cursor)
+        meta = _sincronizar_indice(cursor, tablas)
+
+        # Los embeddings de frecuencias son no negativos: centrar las proyecciones en la media reparte mejor los bits.
+        sumas = np.zeros(EMBEDDING_DIM, dtype=np.float64)
+        filas = 0
+        for tabla in tablas:
+            matriz, _ = _cargar_matriz(tabla, meta[tabla]["filas"])
+            for inicio in range(0, len(matriz), _LOTE_SINCRONIZACION):
+                sumas += matriz[inicio:inicio + _LOTE_SINCRONIZACION].sum(axis=0)
+            filas += len(matriz)
+        centro = (sumas / filas if filas else sumas).astype(EMBEDDING_DTYPE)
+        planos = np.random.default_rng(semilla).standard_normal((ANN_TABLAS, ANN_BITS, EMBEDDING_DIM)).astype(EMBEDDING_DTYPE)
+
+        desactivar_indice_ann(silencioso=True)
+        with open(os.path.join(_ruta_indice(), "ann.npz"), "wb") as f:
+            np.savez(f, planos=planos, centro=centro)
+        _sincronizar_indice(cursor, tablas)
+        print(f"Índice ANN activado ({ANN_TABLAS} tablas x {ANN_BITS} bits, {filas} filas indexadas).")
+
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error al activar el índice ANN: {e}")
+
+def desactivar_indice_ann(silencioso=False):
+    """Desactiva el índice ANN y elimina sus ficheros; la búsqueda exacta no se ve afectada."""
+    os.makedirs(_ruta_indice(), exist_ok=True)
+    with open(os.path.join(_ruta_indice(), "lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        meta = _leer_meta_indice()
+        for tabla, estado in meta.items():
+            estado.pop("codigos", None)
+            estado.pop("ordenadas", None)
+            for extension in ("lsh", "lsh_orden", "lsh_ordenados"):
+                ruta = os.path.join(_ruta_indice(), f"{tabla}.{extension}")
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+        _guardar_meta_indice(meta)
+        ruta = os.path.join(_ruta_indice(), "ann.npz")
+        if os.path.exists(ruta):
+            os.remove(ruta)
+    _ann_cache.clear()
+    if not silencioso:
+        print("Índice ANN desactivado.")
+
+def _candidatos_ann(tabla, estado, query_embedding, radio):
+    """Devuelve las posiciones de la matriz cuyos códigos LSH están a distancia de Hamming <= radio de la consulta."""
+    codigos = estado.get("codigos", 0)
+    ordenadas = estado.get("ordenadas", 0)
+    consulta = _ann_codigos(query_embedding[np.newaxis, :])[0]
+    mascaras = np.asarray(
+        [sum(1 << b for b in bits) for d in range(radio + 1) for bits in itertools.combinations(range(ANN_BITS), d)],
+        dtype=np.uint32
+    )
+
+    partes = []
+    if ordenadas:
+        orden = np.memmap(os.path.join(_ruta_indice(), f"{tabla}.lsh_orden"), dtype='<u4', mode='r', shape=(ANN_TABLAS, ordenadas))
+        ordenados = np.memmap(os.path.join(_ruta_indice(), f"{tabla}.lsh_ordenados"), dtype='<u4', mode='r', shape=(ANN_TABLAS, ordenadas))
+        for t in range(ANN_TABLAS):
+            sondas = np.sort(consulta[t] ^ mascaras)
+            inicios = np.searchsorted(ordenados[t], sondas, side='left')
+            finales = np.searchsorted(ordenados[t], sondas, side='right')
+            partes.extend(orden[t][a:b] for a, b in zip(inicios, finales) if b > a)
+    if codigos > ordenadas:
+        cola = np.fromfile(os.path.join(_ruta_indice(), f"{tabla}.lsh"), dtype='<u4', count=(codigos - ordenadas) * ANN_TABLAS,
+                           offset=ordenadas * ANN_TABLAS * 4).reshape(-1, ANN_TABLAS)
+        cercanos = (_popcount(cola ^ consulta) <= radio).any(axis=1)
+        partes.append(np.flatnonzero(cercanos) + ordenadas)
+
+    if not partes:
+        return np.empty(0, dtype=np.intp)
+    return np.unique(np.concatenate(partes).astype(np.intp))
+
+def _top_k(puntuaciones, k):
+    """Devuelve los índices de las k mayores puntuaciones, ordenados de mayor a menor, sin ordenar todo el vector."""
+    k = min(k, len(puntuaciones))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    candidatos = np.argpartition(-puntuaciones, k - 1)[:k]
+    return candidatos[np.argsort(-puntuaciones[candidatos])]
+
+def _mejores_por_lotes(cursor, esquema, tabla, condiciones, params, query_embedding, top_n):
+    """Puntúa por lotes, sin matriz auxiliar, los embeddings de las filas que cumplen las condiciones; devuelve las top_n [(id, texto, similitud)]."""
+    condiciones = condiciones + ["typeof(embedding_vector) = 'blob'", "embedding_version = ?"]
+    mejores_ids = np.empty(0, dtype='<i8')
+    mejores = np.empty(0, dtype=EMBEDDING_DTYPE)
+    cursor.execute(f"SELECT id, embedding_vector FROM {esquema}.{tabla} WHERE {' AND '.join(condiciones)}", params + [EMBEDDING_VERSION])
+    while True:
+        filas = cursor.fetchmany(_LOTE_SINCRONIZACION)
+        if not filas:
+            break
+        matriz = _decode_embeddings([emb for _, emb in filas])
+        normas = np.linalg.norm(matriz, axis=1)
+        normas[normas == 0] = 1.0
+        puntuaciones = np.concatenate([mejores, (matriz @ query_embedding) / normas])
+        ids = np.concatenate([mejores_ids, np.asarray([row_id for row_id, _ in filas], dtype='<i8')])
+        indices = _top_k(puntuaciones, top_n)
+        mejores, mejores_ids = puntuaciones[indices], ids[indices]
+    if not len(mejores_ids):
+        return []
+    candidatos = [int(row_id) for row_id in mejores_ids]
+    cursor.execute(f"SELECT id, {_ETIQUETAS_BUSQUEDA[tabla][1]} FROM {esquema}.{tabla} WHERE id IN ({', '.join('?' * len(candidatos))})", candidatos)
+    textos = dict(cursor.fetchall())
+    return [(row_id, textos[row_id], float(sim)) for row_id, sim in zip(candidatos, mejores)]
+
+def _normalizar_consulta(query_text):
+    """Calcula el embedding normalizado de un texto de consulta."""
+    query_embedding = _decode_embeddings([_generate_simple_embedding(query_text)])[0]
+    norma = np.linalg.norm(query_embedding)
+    return query_embedding / norma if norma else query_embedding
+
+def _mejores_de_tabla(cursor, tabla, puntuaciones, ids, top_n, desde=None, hasta=None):
+    """Selecciona las top_n filas vivas (y dentro del intervalo de fechas) de una tabla, ampliando si hay ids descartados."""
+    etiqueta, expresion = _ETIQUETAS_BUSQUEDA[tabla]
+    condiciones, params = _condiciones_intervalo(desde, hasta)
+    if condiciones:
+        # El intervalo se aplica antes de ordenar: los ids que caen dentro salen de una sola consulta por el índice
+        # de timestamp. Un comando entra en el intervalo si alguno de sus eventos cae dentro.
+        if tabla == "comandos":
+            cursor.execute(f"SELECT DISTINCT comando_id FROM eventos_norm WHERE {' AND '.join(condiciones)}", params)
+        else:
+            cursor.execute(f"SELECT id FROM {tabla} WHERE {' AND '.join(condiciones)}", params)
+        dentro = np.isin(ids, np.fromiter((row_id for row_id, in cursor), dtype='<i8'))
+        puntuaciones, ids = puntuaciones[dentro], ids[dentro]
+    k = top_n
+    textos, consultados = {}, set()
+    while True:
+        indices = _top_k(puntuaciones, k)
+        candidatos = [int(ids[i]) for i in indices]
+        # Al ampliar solo se consultan los ids nuevos, en lotes que no rozan el límite de variables de SQLite.
+        nuevos = [row_id for row_id in candidatos if row_id not in consultados]
+        consultados.update(nuevos)
+        for inicio in range(0, len(nuevos), _LOTE_SINCRONIZACION):
+            lote = nuevos[inicio:inicio + _LOTE_SINCRONIZACION]
+            cursor.execute(f"SELECT id, {expresion} FROM {tabla} WHERE id IN ({', '.join('?' * len(lote))})", lote)
+            textos.update(cursor.fetchall())
+        vivos = [(etiqueta, textos[row_id], float(puntuaciones[i]), (tabla, row_id))
+                 for row_id, i in zip(candidatos, indices) if row_id in textos]
+        if len(vivos) >= top_n or k >= len(puntuaciones):
+            return vivos[:top_n]
+        k *= 2
+
+def _buscar(cursor, meta, query_embedding, top_n, radio=None, desde=None, hasta=None):
+    """Ejecuta la búsqueda exacta (radio=None) o aproximada con el índice ANN; devuelve los top_n de cada tabla, ordenados, y las filas puntuadas."""
+    results = []
+    puntuadas = 0
+    for tabla in _tablas_buscadas(cursor):
+        estado = meta[tabla]
+        matriz, ids = _cargar_matriz(tabla, estado["filas"])
+        if len(ids) == 0:
+            continue
+        if radio is None:
+            # Las matrices ya están normalizadas: la similitud coseno es un único producto matriz-vector.
+            puntuaciones = matriz @ query_embedding
+        else:
+            posiciones = _candidatos_ann(tabla, estado, query_embedding, radio)
+            if len(posiciones) == 0:
+                continue
+            puntuaciones = matriz[posiciones] @ query_embedding
+            ids = ids[posiciones]
+        puntuadas += len(puntuaciones)
+        results.extend(_mejores_de_tabla(cursor, tabla, puntuaciones, ids, top_n, desde, hasta))
+    results.sort(key=lambda x: x[2], reverse=True)
+    return results, puntuadas
+
+def _mostrar_resultados_similitud(query_text, results):
+    """Imprime la cabecera y los resultados de una búsqueda por similitud."""
+    print(f"\n--- [ Resultados de Búsqueda de Similitud para: '{query_text}' ] ---")
+    if not results:
+        print("No se encontraron resultados similares.")
+    else:
+        for i, (tipo, texto, sim, _) in enumerate(results):
+            print(f"{i+1}. Tipo: {tipo}, Similitud: {sim:.4f}\n   Texto: {texto}\n")
+
+def buscar_similitud(query_text, top_n=5, ann=False, radio=ANN_RADIO, medir_recall=False, incluir_archivo=False, desde=None, hasta=None,
+                     usar_cache=True):
+    """Busca entradas similares en eventos_sistema, conversaciones y memoria_proyectos usando embeddings simplificados."""
+    try:
+        cursor = _obtener_conexion().cursor()
+
+        if ann and not _ann_activo():
+            print("El índice ANN no está activado (use --indice_ann activar); se usa la búsqueda exacta.")
+            ann = False
+
+        # Solo se cachean las búsquedas sobre la base caliente; medir el recall exige buscar de verdad.
+        cacheable = usar_cache and not medir_recall and not (incluir_archivo or desde or hasta)
+        if cacheable:
+            clave = _clave_cache(query_text, top_n, radio if ann else None, _tablas_buscadas(cursor))
+            results, version = _consultar_cache(cursor, clave, query_text, top_n)
+            if results is not None:
+                _mostrar_resultados_similitud(query_text, results)
+                print("------------------------------------------------------------------")
+                return
+
+        query_embedding = _normalizar_consulta(query_text)
+        meta = _sincronizar_indice(cursor, _tablas_buscadas(cursor))
+        pendientes = sum(meta[tabla].get("json", 0) for tabla in _tablas_buscadas(cursor))
+        if pendientes:
+            print(f"Aviso: {pendientes} filas conservan embeddings JSON antiguos y no se buscan; ejecute --migrar_embeddings.")
+
+        inicio = time.perf_counter()
+        por_tabla, puntuadas = _buscar(cursor, meta, query_embedding, top_n, radio if ann else None, desde, hasta)
+        duracion = time.perf_counter() - inicio
+        results = recientes = por_tabla[:top_n]
+
+        # Los archivos mensuales no tienen matriz auxiliar: solo se recorren si se piden o con un intervalo de fechas.
+        if incluir_archivo or desde or hasta:
+            results = results + _buscar_en_archivos(cursor, query_embedding, top_n, desde, hasta)
+            results.sort(key=lambda x: x[2], reverse=True)
+            results = results[:top_n]
+        if cacheable:
+            # La versión se leyó antes de buscar: las filas insertadas mientras tanto se parchearán en el próximo uso.
+            _guardar_en_cache(cursor, clave, query_text, top_n, version, por_tabla)
+
+        _mostrar_resultados_similitud(query_text, results)
+
+        if medir_recall:
+            total = sum(meta[tabla]["filas"] for tabla in _tablas_buscadas(cursor))
+            inicio = time.perf_counter()
+            exactos, _ = _buscar(cursor, meta, query_embedding, top_n, None, desde, hasta)
+            exactos = exactos[:top_n]
+            duracion_exacta = time.perf_counter() - inicio
+            # Con empates en la puntuación, cualquier fila que iguale a la k-ésima exacta cuenta como acierto.
+            # El recall mide el índice ANN: se calcula sobre la base caliente, sin los resultados archivados.
+            umbral = exactos[-1][2] - 1e-6 if exactos else 0.0
+            aciertos = sum(1 for _, _, sim, _ in recientes if sim >= umbral)
+            recall = aciertos / len(exactos) if exactos else 1.0
+            print(f"Recall@{top_n} frente a la búsqueda exacta: {recall:.2%} ({aciertos}/{len(exactos)})")
+            print(f"Filas puntuadas: {puntuadas}/{total}, tiempo: {duracion * 1000:.2f} ms (exacta: {duracion_exacta * 1000:.2f} ms)")
+        print("------------------------------------------------------------------")
+
+    except sqlite3.Error as e:
+        print(f"Error al realizar la búsqueda de similitud: {e}")
+    except Exception as e:
+        print(f"Error inesperado durante la búsqueda de similitud: {e}")
+
+# --- Caché persistente de resultados de búsqueda por similitud ---
+
+CACHE_MAXIMO_ENTRADAS = 256   # Entradas conservadas; al superarlo se expulsan las usadas hace más tiempo (LRU).
+CACHE_PARCHE_MAXIMO = 50000   # Filas nuevas a partir de las cuales es más rápido repetir la búsqueda que parchear.
+
+def _clave_cache(query_text, top_n, radio, tablas):
+    """Clave de una búsqueda: el embedding sin normalizar de la consulta (no el texto), top_n, tablas y modo."""
+    # Dos textos con el mismo embedding dan exactamente los mismos resultados; calcularlo no requiere NumPy.
+    firma = hashlib.sha1(_generate_simple_embedding(query_text))
+    firma.update(f"|{top_n}|{','.join(tablas)}|{'exacta' if radio is None else f'ann{radio}'}|{EMBEDDING_VERSION}".encode())
+    return firma.hexdigest()
+
+def _version_datos(cursor):
+    """Versión de los datos buscables: por tabla, el mayor id (inserciones) y el contador de modificaciones (borrados y cambios)."""
+    cursor.execute("SELECT nombre, valor FROM contadores WHERE nombre LIKE 'modificaciones_%'")
+    modificaciones = dict(cursor.fetchall())
+    version = {}
+    for tabla in _tablas_buscadas(cursor):
+        max_id = cursor.execute(f"SELECT MAX(id) FROM {tabla}").fetchone()[0] or 0
+        version[tabla] = [max_id, modificaciones.get(f"modificaciones_{tabla}", 0)]
+    return version
+
+def _incrementar_contador(conn, nombre, cantidad=1):
+    """Suma una cantidad a un contador persistente de la tabla contadores."""
+    conn.execute(
+        "INSERT INTO contadores (nombre, valor) VALUES (?, ?) ON CONFLICT (nombre) DO UPDATE SET valor = valor + excluded.valor",
+        (nombre, cantidad)
+    )
+
+@contextlib.contextmanager
+def _sin_espera(conn):
+    """Desactiva la espera ante bloqueos mientras dura el bloque: para escrituras prescindibles que no deben frenar una lectura."""
+    conn.execute("PRAGMA busy_timeout = 0")
+    try:
+        yield conn
+    finally:
+        conn.execute(f"PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT * 1000)}")
+
+def _anotar_uso_cache(conn, contador, clave=None, version=None, por_tabla=None):
+    """Anota un uso de la caché (contador, marca LRU y, si se parcheó, la entrada nueva) sin esperar si la base está bloqueada."""
+    try:
+        with _sin_espera(conn), transaccion():
+            if por_tabla is not None:
+                conn.execute("UPDATE cache_busquedas SET version = ?, resultados = ? WHERE clave = ?",
+                             (json.dumps(version), json.dumps(por_tabla, ensure_ascii=False), clave))
+            if clave:
+                conn.execute("UPDATE cache_busquedas SET ultimo_uso = ?, usos = usos + 1 WHERE clave = ?", (time.time(), clave))
+            _incrementar_contador(conn, contador)
+    except sqlite3.OperationalError:
+        # Con otro escritor activo se pierde la marca: la entrada solo envejece antes en el LRU o se parchea otra vez.
+        # No se anota como error silenciado: anotarlo volvería a esperar al mismo cerrojo.
+        pass
+
+def _recortar_por_tabla(candidatos, top_n):
+    """Ordena los candidatos por similitud y conserva como mucho top_n de cada tabla."""
+    cuentas = {}
+    recortados = []
+    for candidato in sorted(candidatos, key=lambda x: x[2], reverse=True):
+        tabla = candidato[3][0]
+        if cuentas.get(tabla, 0) < top_n:
+            cuentas[tabla] = cuentas.get(tabla, 0) + 1
+            recortados.append(candidato)
+    return recortados
+
+def _consultar_cache(cursor, clave, query_text, top_n):
+    """Devuelve los resultados en caché de una búsqueda (parcheados por tabla si hace falta) o None si no son válidos."""
+    conn = cursor.connection
+    fila = cursor.execute("SELECT version, resultados FROM cache_busquedas WHERE clave = ?", (clave,)).fetchone()
+    actual = _version_datos(cursor)
+    if fila:
+        guardada = json.loads(fila[0])
+        # La entrada guarda los top_n de cada tabla: una tabla cambiada se vuelve a puntuar entera sin tocar las
+        # demás, y en una tabla sin cambios basta con puntuar las filas insertadas desde entonces.
+        por_tabla = [(tipo, texto, sim, tuple(origen)) for tipo, texto, sim, origen in json.loads(fila[1])]
+        valida = set(guardada) == set(actual) and all(guardada[tabla][0] <= max_id or guardada[tabla][1] != modificaciones
+                                                      for tabla, (max_id, modificaciones) in actual.items())
+        pendientes = {}
+        for tabla, (max_id, modificaciones) in (actual.items() if valida else ()):
+            id_guardado, modificaciones_guardadas = guardada[tabla]
+            if modificaciones != modificaciones_guardadas:
+                pendientes[tabla] = (0, max_id)
+            elif max_id > id_guardado:
+                pendientes[tabla] = (id_guardado, max_id)
+        # El coste de parchear es el número de ids que hay que recorrer (una cota de las filas por puntuar).
+        if valida and sum(hasta - desde for desde, hasta in pendientes.values()) <= CACHE_PARCHE_MAXIMO:
+            if pendientes:
+                query_embedding = _normalizar_consulta(query_text)
+                repuntuadas = {tabla for tabla, (desde, _) in pendientes.items() if desde == 0}
+                por_tabla = [candidato for candidato in por_tabla if candidato[3][0] not in repuntuadas]
+                # La búsqueda que produjo la entrada pudo ver filas insertadas tras leer la versión: no se repiten.
+                vistas = {origen for _, _, _, origen in por_tabla}
+                for tabla, (desde, hasta) in pendientes.items():
+                    etiqueta = _ETIQUETAS_BUSQUEDA[tabla][0]
+                    mejores = _mejores_por_lotes(cursor, "main", tabla, ["id > ?", "id <= ?"], [desde, hasta], query_embedding, top_n)
+                    por_tabla.extend((etiqueta, texto, sim, (tabla, row_id)) for row_id, texto, sim in mejores
+                                     if (tabla, row_id) not in vistas)
+                por_tabla = _recortar_por_tabla(por_tabla, top_n)
+                _anotar_uso_cache(conn, "cache_parches", clave, actual, por_tabla)
+            else:
+                _anotar_uso_cache(conn, "cache_aciertos", clave)
+            return por_tabla[:top_n], actual
+
+    _anotar_uso_cache(conn, "cache_fallos")
+    return None, actual
+
+def _guardar_en_cache(cursor, clave, query_text, top_n, version, por_tabla):
+    """Guarda los top_n de cada tabla de una búsqueda con la versión de los datos leída antes de calcularlos y aplica el límite LRU."""
+    conn = cursor.connection
+    with transaccion():
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_busquedas (clave, consulta, top_n, version, resultados, ultimo_uso, usos) VALUES (?, ?, ?, ?, ?, ?, 0)",
+            (clave, query_text, top_n, json.dumps(version), json.dumps(por_tabla, ensure_ascii=False), time.time())
+        )
+        expulsadas = conn.execute(
+            "DELETE FROM cache_busquedas WHERE clave IN (SELECT clave FROM cache_busquedas ORDER BY ultimo_uso DESC LIMIT -1 OFFSET ?)",
+            (CACHE_MAXIMO_ENTRADAS,)
+        ).rowcount
+        if expulsadas:
+            _incrementar_contador(conn, "cache_expulsiones", expulsadas)
+
+def estado_cache():
+    """Muestra el tamaño de la caché de búsquedas, sus contadores de aciertos y fallos y las consultas más usadas."""
+    try:
+        cursor = _obtener_conexion().cursor()
+        entradas = cursor.execute("SELECT COUNT(*) FROM cache_busquedas").fetchone()[0]
+        cursor.execute("SELECT nombre, valor FROM contadores WHERE nombre LIKE 'cache_%'")
+        contadores = dict(cursor.fetchall())
+        aciertos = contadores.get("cache_aciertos", 0)
+        parches = contadores.get("cache_parches", 0)
+        fallos = contadores.get("cache_fallos", 0)
+        consultas = aciertos + parches + fallos
+
+        print("--- [ Caché de Búsquedas por Similitud ] ---")
+        print(f"Entradas: {entradas}/{CACHE_MAXIMO_ENTRADAS}  Expulsadas (LRU): {contadores.get('cache_expulsiones', 0)}")
+        print(f"Aciertos: {aciertos}  Parcheadas con filas nuevas: {parches}  Fallos: {fallos}")
+        if consultas:
+            print(f"Tasa de aciertos: {(aciertos + parches) / consultas:.1%}")
+        cursor.execute("SELECT consulta, top_n, usos FROM cache_busquedas ORDER BY usos DESC, ultimo_uso DESC LIMIT 5")
+        for consulta, top_n, usos in cursor.fetchall():
+            print(f"  '{consulta}' (top {top_n}): {usos} usos")
+        print("--------------------------------------------")
+
+    except sqlite3.Error as e:
+        print(f"Error al consultar la caché de búsquedas: {e}")
+
+def limpiar_cache():
+    """Vacía la caché de búsquedas y reinicia sus contadores."""
+    try:
+        with transaccion() as conn:
+            n = conn.execute("DELETE FROM cache_busquedas").rowcount
+            conn.execute("DELETE FROM contadores WHERE nombre LIKE 'cache_%'")
+        print(f"Caché de búsquedas vaciada ({n} entradas).")
+    except sqlite3.Error as e:
+        print(f"Error al vaciar la caché de búsquedas: {e}")
+
+# --- Búsqueda híbrida: candidatos por palabras clave (FTS5) reordenados con el embedding ---
+
+BUSQUEDA_CANDIDATOS = 200   # Candidatos por tabla recuperados del índice de texto.
+BUSQUEDA_PESO_TEXTO = 0.5   # Peso de la relevancia BM25 frente a la similitud del embedding.
+
+# Etiqueta y expresión del texto mostrado por tabla (incluye las tareas, que la similitud no recorre).
+_TABLAS_TEXTO = dict(_TABLAS_BUSQUEDA, tareas_omnicompute=("Tarea Omni-Compute", "'[ID: ' || task_id || '] ' || description"))
+
+def _consulta_fts(texto):
+    """Convierte texto libre en una consulta FTS5 segura: cada palabra como frase literal, todas requeridas."""
+    return " ".join('"' + palabra.replace('"', '""') + '"' for palabra in texto.split())
+
+def buscar_texto(query_text, top_n=5):
+    """Busca por palabras clave con FTS5 y reordena los candidatos combinando BM25 con la similitud del embedding."""
+    try:
+        cursor = _obtener_conexion().cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%_fts'")
+        disponibles = {nombre for (nombre,) in cursor.fetchall()}
+        if not disponibles:
+            print("La búsqueda por palabras clave requiere SQLite con FTS5.")
+            return
+        consulta = _consulta_fts(query_text)
+        if not consulta:
+            print("La consulta no contiene palabras.")
+            return
+        query_embedding = _normalizar_consulta(query_text)
 
         results = []
+        revisadas = 0
+        for tabla, (fts, _) in _TABLAS_FTS.items():
+            if fts not in disponibles:
+                continue
+            # bm25() es menor cuanto más relevante; el índice devuelve solo las filas que contienen las palabras.
+            cursor.execute(
+                f"SELECT rowid, bm25({fts}) FROM {fts} WHERE {fts} MATCH ? ORDER BY bm25({fts}) LIMIT ?",
+                (consulta, BUSQUEDA_CANDIDATOS)
+            )
+            candidatos = dict(cursor.fetchall())
+            if not candidatos:
+                continue
+            revisadas += len(candidatos)
 
-        # Buscar en eventos_sistema
-        cursor.execute("SELECT comando, embedding_vector FROM eventos_sistema WHERE embedding_vector IS NOT NULL")
-        for comando, emb_str in cursor.fetchall():
-            stored_embedding = np.array(json.loads(emb_str))
-            similarity = np.dot(query_embedding, stored_embedding) / (np.linalg.norm(query_embedding) * np.linalg.norm(stored_embedding))
-            results.append(("Evento", comando, similarity))
-
-        # Buscar en conversaciones
-        cursor.execute("SELECT texto, embedding_vector FROM conversaciones WHERE embedding_vector IS NOT NULL")
-        for texto, emb_str in cursor.fetchall():
-            stored_embedding = np.array(json.loads(emb_str))
-            similarity = np.dot(query_embedding, stored_embedding) / (np.linalg.norm(query_embedding) * np.linalg.norm(stored_embedding))
-            results.append(("Conversación", texto, similarity))
-
-        # Buscar en memoria_proyectos
-        cursor.execute("SELECT proyecto, clave, valor, embedding_vector FROM memoria_proyectos WHERE embedding_vector IS NOT NULL")
-        for proyecto, clave, valor, emb_str in cursor.fetchall():
-            stored_embedding = np.array(json.loads(emb_str))
-            similarity = np.dot(query_embedding, stored_embedding) / (np.linalg.norm(query_embedding) * np.linalg.norm(stored_embedding))
-            results.append(("Memoria de Proyecto", f"[Proyecto: {proyecto}] [Clave: {clave}]: {valor}", similarity))
+            etiqueta, expresion = _TABLAS_TEXTO[tabla]
+            marcadores = ", ".join("?" * len(candidatos))
+            cursor.execute(
+                f"SELECT id, {expresion}, embedding_vector FROM {tabla} WHERE id IN ({marcadores}) AND embedding_version = ?",
+                list(candidatos) + [EMBEDDING_VERSION]
+            )
+            filas = [fila for fila in cursor.fetchall() if isinstance(fila[2], bytes)]
+            if not filas:
+                continue
 
-        conn.close()
+            matriz = _decode_embeddings([emb for _, _, emb in filas])
+            normas = np.linalg.norm(matriz, axis=1)
+            normas[normas == 0] = 1.0
+            similitudes = (matriz @ query_embedding) / normas
+            relevancia = -np.asarray([candidatos[row_id] for row_id, _, _ in filas])
+            rango = relevancia.max() - relevancia.min()
+            relevancia = (relevancia - relevancia.min()) / rango if rango else np.ones_like(relevancia)
+            puntuaciones = BUSQUEDA_PESO_TEXTO * relevancia + (1 - BUSQUEDA_PESO_TEXTO) * similitudes
+
+            for i in _top_k(puntuaciones, top_n):
+                results.append((etiqueta, filas[i][1], float(puntuaciones[i]), float(similitudes[i])))
 
         results.sort(key=lambda x: x[2], reverse=True)
 
-        print(f"\n--- [ Resultados de Búsqueda de Similitud para: '{query_text}' ] ---")
+        print(f"\n--- [ Resultados de Búsqueda por Palabras Clave para: '{query_text}' ] ---")
         if not results:
-            print("No se encontraron resultados similares.")
+            print("No se encontraron resultados.")
         else:
-            for i, (tipo, texto, sim) in enumerate(results[:top_n]):
-                print(f"{i+1}. Tipo: {tipo}, Similitud: {sim:.4f}\n   Texto: {texto}\n")
+            for i, (tipo, texto, puntuacion, sim) in enumerate(results[:top_n]):
+                print(f"{i+1}. Tipo: {tipo}, Puntuación: {puntuacion:.4f} (Similitud: {sim:.4f})\n   Texto: {texto}\n")
+        print(f"Filas candidatas revisadas: {revisadas}")
         print("------------------------------------------------------------------")
 
     except sqlite3.Error as e:
-        print(f"Error al realizar la búsqueda de similitud: {e}")
+        print(f"Error al realizar la búsqueda por palabras clave: {e}")
     except Exception as e:
-        print(f"Error inesperado durante la búsqueda de similitud: {e}")
+        print(f"Error inesperado durante la búsqueda por palabras clave: {e}")
+
+def _convertir_embedding_json(texto, emb_str):
+    """Convierte un embedding JSON antiguo a BLOB float32, recalculándolo desde el texto si el JSON no es válido."""
+    try:
+        embedding = np.asarray(json.loads(emb_str), dtype=EMBEDDING_DTYPE)
+        if embedding.shape != (EMBEDDING_DIM,):
+            raise ValueError("dimensión inesperada")
+        return embedding.tobytes()
+    except ValueError:
+        # JSON corrupto o truncado: se recalcula desde el texto original.
+        return _generate_simple_embedding(texto or "")
+
+def migrar_embeddings_binarios():
+    """Convierte en el sitio los embeddings JSON antiguos al formato BLOB float32 y compacta la base de datos."""
+    try:
+        conn = _obtener_conexion()
+        total = 0
+
+        for table in EMBEDDING_TABLES:
+            table = _tabla_embeddings(conn.cursor(), table)
+            convertidas = 0
+            ultimo_id = 0
+            # Por fragmentos recorridos por id, cada uno en su transacción: la memoria no crece con la tabla
+            # y el registro de eventos concurrente no espera a toda la conversión.
+            while True:
+                filas = conn.execute(
+                    f"SELECT id, {_COLUMNAS_TEXTO[table]}, embedding_vector FROM {table} "
+                    f"WHERE id > ? AND typeof(embedding_vector) = 'text' ORDER BY id LIMIT ?",
+                    (ultimo_id, RECALCULO_LOTE)
+                ).fetchall()
+                if not filas:
+                    break
+                with transaccion():
+                    conn.executemany(
+                        f"UPDATE {table} SET embedding_vector = ?, embedding_version = {EMBEDDING_VERSION} WHERE id = ?",
+                        [(_convertir_embedding_json(texto, emb_str), row_id) for row_id, texto, emb_str in filas]
+                    )
+                convertidas += len(filas)
+                ultimo_id = filas[-1][0]
+            total += convertidas
+            print(f"Tabla '{table}': {convertidas} embeddings convertidos a formato binario.")
+
+        # Recupera el espacio que ocupaba el texto JSON.
+        if total:
+            _compactar(conn)
+            _invalidar_indice()
+        print(f"Migración de embeddings completada ({total} filas).")
+
+    except sqlite3.Error as e:
+        print(f"Error al migrar embeddings: {e}")
+
+# Filas por fragmento de recálculo: cada fragmento se escribe en una transacción corta
+# para que el registro de eventos concurrente nunca espere más que unos milisegundos.
+RECALCULO_LOTE = 2000
+
+# Columna de texto por tabla física con embeddings: con los eventos normalizados, la de eventos_sistema está en comandos.
+_COLUMNAS_TEXTO = dict(EMBEDDING_TABLES, comandos="comando")
+
+def _calcular_embeddings(filas):
+    """Calcula (en un proceso de trabajo) los embeddings de un fragmento [(id, texto)] listos para el UPDATE."""
+    embeddings = _embeddings_en_lote([texto or "" for _, texto in filas])
+    return [(embedding, EMBEDDING_VERSION, row_id) for (row_id, _), embedding in zip(filas, embeddings)]
+
+def _fragmentos_obsoletos(conn, esquema, tabla):
+    """Genera fragmentos [(id, texto)] de las filas sin embedding o con otra versión, recorriendo la tabla por id."""
+    ultimo_id = 0
+    while True:
+        filas = conn.execute(
+            f"SELECT id, {_COLUMNAS_TEXTO[tabla]} FROM {esquema}.{tabla} WHERE id > ? "
+            f"AND (typeof(embedding_vector) != 'blob' OR embedding_version IS NOT ?) ORDER BY id LIMIT ?",
+            (ultimo_id, EMBEDDING_VERSION, RECALCULO_LOTE)
+        ).fetchall()
+        if not filas:
+            return
+        yield filas
+        ultimo_id = filas[-1][0]
+
+def _recalcular_tabla(conn, ejecutor, esquema, tabla, en_vuelo_maximo):
+    """Recalcula los embeddings obsoletos de una tabla con fragmentos en paralelo y los escribe en orden; devuelve las filas actualizadas."""
+    def escribir(pendiente):
+        resultado = pendiente.result() if ejecutor else _calcular_embeddings(pendiente)
+        with transaccion():
+            conn.executemany(f"UPDATE {esquema}.{tabla} SET embedding_vector = ?, embedding_version = ? WHERE id = ?", resultado)
+        return len(resultado)
+
+    actualizadas = 0
+    en_vuelo = []
+    for fragmento in _fragmentos_obsoletos(conn, esquema, tabla):
+        en_vuelo.append(ejecutor.submit(_calcular_embeddings, fragmento) if ejecutor else fragmento)
+        # Solo unos pocos fragmentos en vuelo: la memoria no crece con el tamaño de la tabla.
+        if len(en_vuelo) >= en_vuelo_maximo:
+            actualizadas += escribir(en_vuelo.pop(0))
+            print(f"\r{esquema}.{tabla}: {actualizadas} filas recalculadas", end="", file=sys.stderr, flush=True)
+    while en_vuelo:
+        actualizadas += escribir(en_vuelo.pop(0))
+    if actualizadas:
+        print(f"\r{esquema}.{tabla}: {actualizadas} filas recalculadas", file=sys.stderr)
+    return actualizadas
+
+def recalcular_embeddings(procesos=None, incluir_archivo=False):
+    """Recalcula con un pool de procesos los embeddings ausentes o de otra versión; reanudable, en transacciones cortas."""
+    procesos = procesos or os.cpu_count() or 1
+    try:
+        ejecutor = futures.ProcessPoolExecutor(max_workers=procesos) if procesos > 1 else None
+    except (ImportError, NotImplementedError, OSError):
+        # Sin sem_open (p. ej. Android/Termux) no hay pool de procesos: se calcula en este proceso.
+        ejecutor = None
+
+    try:
+        conn = _obtener_conexion()
+        total = 0
+        recalculadas = []
+        for tabla in [_tabla_embeddings(conn.cursor(), tabla) for tabla in EMBEDDING_TABLES]:
+            n = _recalcular_tabla(conn, ejecutor, "main", tabla, procesos * 2)
+            if n:
+                recalculadas.append(tabla)
+            total += n
+        # Los vectores reescritos tienen ids antiguos: la sincronización incremental no los vería.
+        _reiniciar_matrices(recalculadas)
+
+        if incluir_archivo:
+            for _, ruta in _meses_archivados():
+                with _archivo_adjunto(conn, ruta) as esquema:
+                    for tabla in _TABLAS_ARCHIVABLES:
+                        if conn.execute(f"SELECT 1 FROM {esquema}.sqlite_master WHERE name = ?", (tabla,)).fetchone():
+                            _preparar_archivo(conn, tabla)  # Archivos anteriores a embedding_version.
+                            total += _recalcular_tabla(conn, ejecutor, esquema, tabla, procesos * 2)
+
+        print(f"Recálculo de embeddings completado: {total} filas llevadas a la versión {EMBEDDING_VERSION}.")
+
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error al recalcular embeddings: {e}")
+        print("Los fragmentos confirmados se conservan; al repetir el comando solo se procesan las filas pendientes.")
+    finally:
+        if ejecutor:
+            ejecutor.shutdown(cancel_futures=True)
 
 def revisar_tareas_omnicompute():
     """Muestra las últimas 10 tareas de Omni-Compute registradas."""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = _obtener_conexion()
         cursor = conn.cursor()
         
         cursor.execute(
-            "SELECT timestamp, task_id, description, platform, status, start_time, end_time, output_log, error_log FROM tareas_omnicompute ORDER BY timestamp DESC LIMIT 10"
+            "SELECT timestamp, task_id, description, platform, status, start_time, end_time FROM tareas_omnicompute ORDER BY timestamp DESC LIMIT 10"
         )
         
         tareas = cursor.fetchall()
@@ -391,24 +1958,834 @@ def revisar_tareas_omnicompute():
             print("No hay tareas de Omni-Compute registradas aún.")
         else:
             for tarea in reversed(tareas):
-                timestamp, task_id, description, platform, status, start_time, end_time, output_log, error_log = tarea
+                timestamp, task_id, description, platform, status, start_time, end_time = tarea
                 print(f"[{timestamp}] [ID: {task_id}] [Plataforma: {platform}] [Estado: {status}]\n  Descripción: {description}\n  Inicio: {start_time}, Fin: {end_time if end_time else 'N/A'}")
-                if output_log:
-                    print(f"  Output Log:\n{output_log}")
-                if error_log:
-                    print(f"  Error Log:\n{error_log}")
+                # Solo tamaño y últimas líneas; el log completo se lee con --log_tarea.
+                for flujo, titulo in (("output", "Output Log"), ("error", "Error Log")):
+                    tamano = _tamano_log(cursor, task_id, flujo)
+                    if tamano:
+                        cola = _cola_log(cursor, task_id, flujo, LOG_COLA_LINEAS)
+                        print(f"  {titulo} ({tamano} bytes, últimas líneas):\n{cola}")
         print("------------------------------------------------------------")
 
-        conn.close()
-
     except sqlite3.Error as e:
         print(f"Error al consultar tareas de Omni-Compute: {e}")
 
+# --- Retención: las filas antiguas pasan a ficheros de archivo mensuales fuera de la base caliente ---
+
+RETENCION_DIAS = 90    # Antigüedad a partir de la cual --archivar mueve las filas al archivo.
+
+# Tablas de historial que crecen sin límite; memoria y tareas son pequeñas y se consultan por clave.
+_TABLAS_ARCHIVABLES = ("eventos_sistema", "conversaciones")
+
+def _ruta_archivos():
+    """Devuelve el directorio de los ficheros de archivo mensuales junto a la base de datos."""
+    return DB_PATH + ".archivo"
+
+def _meses_archivados(desde=None, hasta=None):
+    """Devuelve [(mes, ruta)] de los archivos mensuales que solapan el intervalo [desde, hasta), del más reciente al más antiguo."""
+    try:
+        nombres = os.listdir(_ruta_archivos())
+    except OSError:
+        return []
+    meses = []
+    for nombre in nombres:
+        if not (nombre.startswith("cronos-") and nombre.endswith(".db")):
+            continue
+        mes = nombre[len("cronos-"):-len(".db")]
+        año, numero = map(int, mes.split("-"))
+        siguiente = f"{año + numero // 12:04d}-{numero % 12 + 1:02d}"
+        if (hasta is None or f"{mes}-01" < hasta) and (desde is None or f"{siguiente}-01" > desde):
+            meses.append((mes, os.path.join(_ruta_archivos(), nombre)))
+    return sorted(meses, reverse=True)
+
+@contextlib.contextmanager
+def _archivo_adjunto(conn, ruta):
+    """Adjunta un fichero de archivo como esquema 'archivo' mientras dura el bloque (de uno en uno: SQLite limita los ATTACH)."""
+    conn.execute("ATTACH DATABASE ? AS archivo", (ruta,))
+    try:
+        yield "archivo"
+    finally:
+        conn.execute("DETACH DATABASE archivo")
+
+def _tabla_archivada(conn, esquema, tabla):
+    """Indica si el archivo adjunto contiene la tabla (solo se crea en los meses en que tuvo filas que archivar)."""
+    return conn.execute(f"SELECT 1 FROM {esquema}.sqlite_master WHERE type = 'table' AND name = ?", (tabla,)).fetchone() is not None
+
+def _condiciones_intervalo(desde, hasta):
+    """Devuelve las condiciones SQL y parámetros que acotan timestamp al intervalo [desde, hasta)."""
+    condiciones, params = [], []
+    if desde:
+        condiciones.append("timestamp >= ?")
+        params.append(desde)
+    if hasta:
+        condiciones.append("timestamp < ?")
+        params.append(hasta)
+    return condiciones, params
+
+def _filas_recientes(cursor, tabla, columnas, condiciones, params, limite, archivo=False, desde=None, hasta=None, pagina=None):
+    """Recorre las filas de una tabla de la más reciente a la más antigua, mezclando la base caliente con sus archivos si se piden.
+
+    'pagina' es un cursor (timestamp, id): solo se devuelven las filas anteriores a él."""
+    def consulta(esquema):
+        seleccion = f"SELECT {', '.join(columnas)} FROM {esquema}.{tabla}"
+        if pagina:
+            # (timestamp, id) < (?, ?) solo acota el índice por timestamp y recorrería todos los empates (las
+            # importaciones del historial comparten marca); partido en dos ramas, cada una es un rango del índice.
+            marca, ultimo_id = pagina
+            sql = (f"{seleccion} WHERE {' AND '.join(condiciones + ['timestamp = ?', 'id < ?'])} UNION ALL "
+                   f"{seleccion} WHERE {' AND '.join(condiciones + ['timestamp < ?'])}")
+            argumentos = params + [marca, ultimo_id] + params + [marca]
+        else:
+            sql = f"{seleccion} WHERE {' AND '.join(condiciones)}" if condiciones else seleccion
+            argumentos = list(params)
+        sql += " ORDER BY timestamp DESC, id DESC"
+        return sql + " LIMIT ?" if limite else sql, argumentos + [limite] if limite else argumentos
+
+    clave = lambda fila: (fila[columnas.index("timestamp")], fila[columnas.index("id")])
+    caliente = cursor.execute(*consulta("main"))
+    if not archivo or tabla not in _TABLAS_ARCHIVABLES:
+        yield from caliente
+        return
+
+    def archivadas():
+        # Cada mes solo contiene filas de ese mes: recorrerlos en orden ya da un flujo ordenado.
+        # Cada mes se lee con su propia conexión y no adjunto: mientras la consulta caliente siga a medias,
+        # SQLite no permite el DETACH de un mes ya agotado ("database archivo is locked").
+        for _, ruta in _meses_archivados(desde, hasta):
+            with contextlib.closing(sqlite3.connect(ruta)) as mes:
+                if _tabla_archivada(mes, "main", tabla):
+                    yield from mes.execute(*consulta("main"))
+
+    # Se cierra explícitamente para cerrar el mes en curso aunque el llamante no agote el recorrido.
+    meses = archivadas()
+    try:
+        yield from itertools.islice(heapq.merge(caliente, meses, key=clave, reverse=True), limite or None)
+    finally:
+        meses.close()
+
+def _preparar_archivo(conn, tabla):
+    """Crea la tabla en el archivo adjunto con el esquema de la caliente, o le añade las columnas que le falten."""
+    fila = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (tabla,)).fetchone()
+    info = conn.execute(f"PRAGMA main.table_info({tabla})").fetchall()
+    if fila:
+        conn.execute(fila[0].replace(f"CREATE TABLE {tabla}", f"CREATE TABLE IF NOT EXISTS archivo.{tabla}", 1))
+    else:
+        # Con los eventos normalizados eventos_sistema es una vista: el archivo guarda sus filas desnormalizadas.
+        definiciones = ", ".join("id INTEGER PRIMARY KEY" if nombre == "id" else f"{nombre} {tipo}" for _, nombre, tipo, _, _, _ in info)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS archivo.{tabla} ({definiciones})")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS archivo.idx_{tabla}_timestamp ON {tabla} (timestamp)")
+    existentes = {col[1] for col in conn.execute(f"PRAGMA archivo.table_info({tabla})")}
+    columnas = []
+    for _, nombre, tipo, _, por_defecto, _ in info:
+        if nombre not in existentes:
+            defecto = f" DEFAULT {por_defecto}" if por_defecto is not None else ""
+            conn.execute(f"ALTER TABLE archivo.{tabla} ADD COLUMN {nombre} {tipo}{defecto}")
+        columnas.append(nombre)
+    return ", ".join(columnas)
+
+def _compactar(conn):
+    """Devuelve al sistema las páginas libres de la base caliente y trunca el WAL."""
+    # La primera vez se activa auto_vacuum incremental (requiere un VACUUM completo); después basta con liberar páginas.
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    else:
+        # Con execute() la pragma solo libera una página; executescript la ejecuta hasta el final (no hay transacción abierta).
+        conn.executescript("PRAGMA incremental_vacuum;")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+def archivar_historial(dias=RETENCION_DIAS):
+    """Mueve las filas de eventos y conversaciones con más de 'dias' días a archivos mensuales y compacta la base caliente."""
+    try:
+        conn = _obtener_conexion()
+        corte = conn.execute("SELECT datetime('now', ?)", (f"-{dias} days",)).fetchone()[0]
+        tamano_inicial = os.path.getsize(DB_PATH)
+
+        # Los agregados del análisis conservan la historia completa: se ponen al día antes de borrar nada.
+        _actualizar_rollups(conn)
+        os.makedirs(_ruta_archivos(), exist_ok=True)
+        normalizados = _eventos_normalizados(conn.cursor())
+        movidas = {}
+        for tabla in _TABLAS_ARCHIVABLES:
+            # Sobre la vista de eventos normalizados se lee por la vista, pero se consulta y borra en la tabla real.
+            fisica = "eventos_norm" if normalizados and tabla == "eventos_sistema" else tabla
+            while True:
+                mes = conn.execute(f"SELECT strftime('%Y-%m', MIN(timestamp)) FROM {fisica} WHERE timestamp < ?", (corte,)).fetchone()[0]
+                if mes is None:
+                    break
+                fin = conn.execute("SELECT date(?, '+1 month')", (f"{mes}-01",)).fetchone()[0]
+                rango = (f"{mes}-01", min(fin, corte))
+                with _archivo_adjunto(conn, os.path.join(_ruta_archivos(), f"cronos-{mes}.db")):
+                    columnas = _preparar_archivo(conn, tabla)
+                    # En WAL cada fichero confirma por separado: OR IGNORE hace que repetir un mes interrumpido sea inocuo.
+                    with transaccion():
+                        conn.execute(
+                            f"INSERT OR IGNORE INTO archivo.{tabla} ({columnas}) SELECT {columnas} FROM main.{tabla} "
+                            f"WHERE timestamp >= ? AND timestamp < ?", rango
+                        )
+                        n = conn.execute(f"DELETE FROM main.{fisica} WHERE timestamp >= ? AND timestamp < ?", rango).rowcount
+                movidas[mes] = movidas.get(mes, 0) + n
+
+        if not movidas:
+            print(f"No hay filas con más de {dias} días que archivar.")
+            return
+
+        if normalizados:
+            # Los comandos y directorios que solo aparecen en eventos archivados dejan la base caliente.
+            with transaccion():
+                conn.execute("DELETE FROM comandos WHERE id NOT IN (SELECT comando_id FROM eventos_norm)")
+                conn.execute("DELETE FROM directorios WHERE id NOT IN (SELECT directorio_id FROM eventos_norm WHERE directorio_id IS NOT NULL)")
+
+        # Las matrices de búsqueda de las tablas archivadas se reconstruyen (más pequeñas) en la próxima búsqueda.
+        _reiniciar_matrices(_TABLAS_ARCHIVABLES + ("comandos",))
+        _compactar(conn)
+
+        print(f"--- [ Archivo de la Bitácora Cronos (filas anteriores a {corte}) ] ---")
+        for mes in sorted(movidas):
+            print(f"  {mes}: {movidas[mes]} filas -> {os.path.join(_ruta_archivos(), f'cronos-{mes}.db')}")
+        print(f"Base caliente: {tamano_inicial / 1e6:.1f} MB -> {os.path.getsize(DB_PATH) / 1e6:.1f} MB")
+        print("------------------------------------------------------------------")
+
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error al archivar la Bitácora Cronos: {e}")
+
+def _buscar_en_archivos(cursor, query_embedding, top_n, desde=None, hasta=None):
+    """Búsqueda exacta por similitud sobre los archivos mensuales, leyendo sus embeddings por lotes (sin matriz auxiliar)."""
+    condiciones, params = _condiciones_intervalo(desde, hasta)
+    results = []
+    conn = cursor.connection
+    for mes, ruta in _meses_archivados(desde, hasta):
+        with _archivo_adjunto(conn, ruta) as esquema:
+            lector = conn.cursor()
+            try:
+                for tabla in _TABLAS_ARCHIVABLES:
+                    if not _tabla_archivada(lector.connection, esquema, tabla):
+                        continue
+                    _preparar_archivo(conn, tabla)  # Archivos anteriores a embedding_version.
+                    etiqueta = _TABLAS_BUSQUEDA[tabla][0]
+                    mejores = _mejores_por_lotes(lector, esquema, tabla, condiciones, params, query_embedding, top_n)
+                    results.extend((f"{etiqueta} (archivo {mes})", texto, sim, (tabla, row_id)) for row_id, texto, sim in mejores)
+            finally:
+                lector.close()
+    return results
+
+# --- Eventos normalizados: diccionarios de comandos y directorios distintos referenciados por id entero ---
+
+def _script_normalizacion(fts):
+    """Esquema normalizado de eventos: tablas, vista eventos_sistema compatible, triggers e índices."""
+    script = """
+        CREATE TABLE comandos (
+            id INTEGER PRIMARY KEY,
+            comando TEXT NOT NULL UNIQUE,
+            embedding_vector BLOB,
+            embedding_version INTEGER DEFAULT 1
+        );
+        CREATE TABLE directorios (
+            id INTEGER PRIMARY KEY,
+            directorio TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE eventos_norm (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            directorio_id INTEGER,
+            comando_id INTEGER NOT NULL,
+            sesion_id TEXT
+        );
+        INSERT INTO comandos (comando) SELECT comando FROM eventos_sistema WHERE comando IS NOT NULL GROUP BY comando ORDER BY MIN(id);
+        INSERT INTO directorios (directorio) SELECT directorio FROM eventos_sistema WHERE directorio IS NOT NULL GROUP BY directorio ORDER BY MIN(id);
+        INSERT INTO eventos_norm (id, timestamp, directorio_id, comando_id, sesion_id)
+            SELECT e.id, e.timestamp, d.id, c.id, e.sesion_id FROM eventos_sistema e
+            JOIN comandos c ON c.comando = e.comando LEFT JOIN directorios d ON d.directorio = e.directorio ORDER BY e.id;
+        DELETE FROM sqlite_sequence WHERE name = 'eventos_norm';
+        UPDATE sqlite_sequence SET name = 'eventos_norm' WHERE name = 'eventos_sistema';
+        DROP TABLE eventos_sistema;
+        CREATE INDEX idx_eventos_norm_timestamp ON eventos_norm (timestamp);
+        CREATE INDEX idx_eventos_norm_comando ON eventos_norm (comando_id, timestamp);
+
+        CREATE VIEW eventos_sistema AS
+            SELECT e.id AS id, e.timestamp AS timestamp, d.directorio AS directorio, c.comando AS comando, e.sesion_id AS sesion_id,
+                   c.embedding_vector AS embedding_vector, c.embedding_version AS embedding_version
+            FROM eventos_norm e JOIN comandos c ON c.id = e.comando_id LEFT JOIN directorios d ON d.id = e.directorio_id;
+
+        CREATE TRIGGER eventos_sistema_insertar INSTEAD OF INSERT ON eventos_sistema BEGIN
+            INSERT OR IGNORE INTO comandos (comando, embedding_vector, embedding_version)
+                VALUES (new.comando, new.embedding_vector, new.embedding_version);
+            INSERT OR IGNORE INTO directorios (directorio) SELECT new.directorio WHERE new.directorio IS NOT NULL;
+            INSERT INTO eventos_norm (id, timestamp, directorio_id, comando_id, sesion_id) VALUES (
+                new.id, COALESCE(new.timestamp, CURRENT_TIMESTAMP),
+                (SELECT id FROM directorios WHERE directorio = new.directorio),
+                (SELECT id FROM comandos WHERE comando = new.comando), new.sesion_id);
+        END;
+        CREATE TRIGGER eventos_sistema_borrar INSTEAD OF DELETE ON eventos_sistema BEGIN
+            DELETE FROM eventos_norm WHERE id = old.id;
+        END;
+        CREATE TRIGGER eventos_sistema_actualizar INSTEAD OF UPDATE ON eventos_sistema BEGIN
+            INSERT OR IGNORE INTO comandos (comando, embedding_vector, embedding_version)
+                VALUES (new.comando, new.embedding_vector, new.embedding_version);
+            INSERT OR IGNORE INTO directorios (directorio) SELECT new.directorio WHERE new.directorio IS NOT NULL;
+            UPDATE eventos_norm SET timestamp = new.timestamp, sesion_id = new.sesion_id,
+                directorio_id = (SELECT id FROM directorios WHERE directorio = new.directorio),
+                comando_id = (SELECT id FROM comandos WHERE comando = new.comando)
+            WHERE id = old.id;
+            -- El embedding pertenece al comando y lo comparten todos sus eventos.
+            UPDATE comandos SET embedding_vector = new.embedding_vector, embedding_version = new.embedding_version
+            WHERE comando = new.comando
+              AND (embedding_vector IS NOT new.embedding_vector OR embedding_version IS NOT new.embedding_version);
+        END;
+    """
+    # Contadores de modificaciones de la caché de búsquedas: ahora se busca sobre los comandos distintos.
+    for evento in ("DELETE", "UPDATE"):
+        script += f"""
+            CREATE TRIGGER comandos_version_{evento.lower()} AFTER {evento} ON comandos BEGIN
+                INSERT INTO contadores (nombre, valor) VALUES ('modificaciones_comandos', 1)
+                    ON CONFLICT (nombre) DO UPDATE SET valor = valor + 1;
+            END;
+        """
+    if fts:
+        # El índice FTS sigue siendo por evento (mismos rowid), con el texto resuelto en el diccionario.
+        script += """
+            CREATE TRIGGER eventos_fts_ai AFTER INSERT ON eventos_norm BEGIN
+                INSERT INTO eventos_fts (rowid, comando) VALUES (new.id, (SELECT comando FROM comandos WHERE id = new.comando_id));
+            END;
+            CREATE TRIGGER eventos_fts_ad AFTER DELETE ON eventos_norm BEGIN
+                INSERT INTO eventos_fts (eventos_fts, rowid, comando)
+                    VALUES ('delete', old.id, (SELECT comando FROM comandos WHERE id = old.comando_id));
+            END;
+            CREATE TRIGGER eventos_fts_au AFTER UPDATE OF comando_id ON eventos_norm BEGIN
+                INSERT INTO eventos_fts (eventos_fts, rowid, comando)
+                    VALUES ('delete', old.id, (SELECT comando FROM comandos WHERE id = old.comando_id));
+                INSERT INTO eventos_fts (rowid, comando) VALUES (new.id, (SELECT comando FROM comandos WHERE id = new.comando_id));
+            END;
+        """
+    return script
+
+def normalizar_eventos():
+    """Convierte eventos_sistema al almacenamiento normalizado: un embedding por comando distinto y eventos con ids enteros."""
+    try:
+        conn = _obtener_conexion()
+        if _eventos_normalizados(conn.cursor()):
+            print("Los eventos ya usan el almacenamiento normalizado.")
+            return
+        tamano_inicial = os.path.getsize(DB_PATH)
+        fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'eventos_fts'").fetchone() is not None
+
+        # Todo en una transacción: o la base queda convertida, o queda como estaba.
+        with transaccion():
+            _ejecutar_script(conn, _script_normalizacion(fts))
+            comandos = conn.execute("SELECT id, comando FROM comandos").fetchall()
+            for inicio in range(0, len(comandos), RECALCULO_LOTE):
+                conn.executemany("UPDATE comandos SET embedding_vector = ?, embedding_version = ? WHERE id = ?",
+                                 _calcular_embeddings(comandos[inicio:inicio + RECALCULO_LOTE]))
+            # Las entradas en caché apuntan a ids de eventos; ahora los resultados son comandos.
+            conn.execute("DELETE FROM cache_busquedas")
+            eventos = conn.execute("SELECT COUNT(*) FROM eventos_norm").fetchone()[0]
+            directorios = conn.execute("SELECT COUNT(*) FROM directorios").fetchone()[0]
+
+        _reiniciar_matrices(["eventos_sistema", "comandos"])
+        _compactar(conn)
+
+        print("--- [ Normalización de la Bitácora Cronos ] ---")
+        print(f"Eventos: {eventos}, comandos distintos: {len(comandos)}, directorios distintos: {directorios}")
+        print(f"Base de datos: {tamano_inicial / 1e6:.1f} MB -> {os.path.getsize(DB_PATH) / 1e6:.1f} MB")
+        print("------------------------------------------------------------------")
+
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error al normalizar los eventos: {e}")
+
+# --- Importación y exportación masiva: historiales de bash/zsh y volcados JSONL ---
+
+IMPORTACION_LOTE = 20000   # Filas por transacción (y por punto de control) al importar.
+
+def _marca_unix(segundos):
+    """Convierte una marca de tiempo Unix al formato de timestamp de la bitácora (UTC, como CURRENT_TIMESTAMP)."""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(int(segundos)))
+
+def _leer_historial_bash(f, desplazamiento):
+    """Genera (desplazamiento, tabla, registro) por cada comando de un ~/.bash_history (con o sin HISTTIMEFORMAT)."""
+    marca = None
+    for linea in f:
+        desplazamiento += len(linea)
+        texto = linea.decode("utf-8", "replace").rstrip("\r\n")
+        if texto.startswith("#") and texto[1:].isdigit():
+            marca = _marca_unix(texto[1:])
+            continue
+        if texto.strip():
+            yield desplazamiento, "eventos_sistema", {"timestamp": marca, "comando": texto}
+        marca = None
+
+def _leer_historial_zsh(f, desplazamiento):
+    """Genera (desplazamiento, tabla, registro) por cada comando de un historial zsh (': inicio:duración;comando')."""
+    pendiente = b""
+    for linea in f:
+        desplazamiento += len(linea)
+        # zsh guarda los comandos de varias líneas con una barra invertida al final de cada línea intermedia.
+        if linea.endswith(b"\\\n"):
+            pendiente += linea[:-2] + b"\n"
+            continue
+        texto = (pendiente + linea).decode("utf-8", "replace").rstrip("\r\n")
+        pendiente = b""
+        marca = None
+        if texto.startswith(": ") and ";" in texto:
+            cabecera, _, comando = texto.partition(";")
+            inicio = cabecera[2:].partition(":")[0].strip()
+            if inicio.isdigit():
+                texto, marca = comando, _marca_unix(inicio)
+        if texto.strip():
+            yield desplazamiento, "eventos_sistema", {"timestamp": marca, "comando": texto}
+
+def _leer_jsonl(f, desplazamiento):
+    """Genera (desplazamiento, tabla, registro) por cada línea de un volcado JSONL de --exportar jsonl o --explorar --jsonl."""
+    for linea in f:
+        desplazamiento += len(linea)
+        if not linea.strip():
+            continue
+        try:
+            registro = json.loads(linea)
+            tabla, columnas = _TABLAS_EXPLORAR[registro.get("tabla", "eventos")][:2]
+        except (ValueError, KeyError) as e:
+            raise ValueError(f"línea no válida en el byte {desplazamiento - len(linea)}: {e}")
+        # Los ids se reasignan al insertar: los del origen chocarían con los existentes.
+        yield desplazamiento, tabla, {col: registro[col] for col in columnas if col != "id" and col in registro}
+
+_LECTORES_IMPORTACION = {
+    "bash": _leer_historial_bash,
+    "zsh": _leer_historial_zsh,
+    "jsonl": _leer_jsonl
+}
+
+def _insertar_lote(conn, lote, ahora):
+    """Inserta un lote de registros con executemany, agrupados por tabla y columnas, con sus embeddings calculados en bloque."""
+    grupos = {}
+    for _, tabla, registro in lote:
+        if not registro.get("timestamp"):
+            registro["timestamp"] = ahora
+        if tabla == "eventos_sistema":
+            registro.setdefault("sesion_id", "importacion")
+        grupos.setdefault((tabla, tuple(registro)), []).append(registro)
+
+    for (tabla, columnas), registros in grupos.items():
+        embeddings = _embeddings_en_lote([registro.get(EMBEDDING_TABLES[tabla]) or "" for registro in registros])
+        # memoria_proyectos tiene clave única (proyecto, clave): la entrada importada actualiza la existente.
+        conflicto = ""
+        if tabla == "memoria_proyectos":
+            conflicto = " ON CONFLICT (proyecto, clave) DO UPDATE SET " + ", ".join(
+                f"{col} = excluded.{col}" for col in columnas + ("embedding_vector", "embedding_version") if col not in ("proyecto", "clave"))
+        conn.executemany(
+            f"INSERT INTO {tabla} ({', '.join(columnas)}, embedding_vector, embedding_version) VALUES ({', '.join('?' * (len(columnas) + 2))})"
+            f"{conflicto}",
+            ([registro[col] for col in columnas] + [embedding, EMBEDDING_VERSION] for registro, embedding in zip(registros, embeddings))
+        )
+
+def importar_historial(formato, ruta, reiniciar=False):
+    """Importa un historial de bash/zsh o un volcado JSONL por lotes, reanudando desde el último punto de control del fichero."""
+    try:
+        conn = _obtener_conexion()
+        ruta = os.path.abspath(ruta)
+        tamano = os.path.getsize(ruta)
+        fila = conn.execute("SELECT desplazamiento, filas FROM importaciones WHERE ruta = ?", (ruta,)).fetchone()
+        inicio, filas = fila if fila and not reiniciar else (0, 0)
+        if inicio > tamano:
+            # El fichero se truncó o se rotó desde la última importación: se empieza de nuevo.
+            inicio, filas = 0, 0
+        if inicio:
+            print(f"Reanudando '{ruta}' desde el byte {inicio} ({filas} filas ya importadas).", file=sys.stderr)
+
+        ahora = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        comienzo = time.perf_counter()
+        nuevas = 0
+        with open(ruta, "rb") as f:
+            f.seek(inicio)
+            registros = _LECTORES_IMPORTACION[formato](f, inicio)
+            while True:
+                lote = list(itertools.islice(registros, IMPORTACION_LOTE))
+                if not lote:
+                    break
+                # El lote y su punto de control se confirman juntos: una interrupción nunca duplica ni pierde filas.
+                with transaccion():
+                    _insertar_lote(conn, lote, ahora)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO importaciones (ruta, formato, desplazamiento, filas, actualizado) "
+                        "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                        (ruta, formato, lote[-1][0], filas + nuevas + len(lote))
+                    )
+                nuevas += len(lote)
+                transcurrido = time.perf_counter() - comienzo
+                print(f"\r{nuevas} filas importadas ({lote[-1][0] / max(tamano, 1):.0%} del fichero, "
+                      f"{nuevas / transcurrido:.0f} filas/s)", end="", file=sys.stderr, flush=True)
+
+        if nuevas:
+            print(file=sys.stderr)
+        print(f"Importación de '{ruta}' completada: {nuevas} filas nuevas ({filas + nuevas} en total).")
+
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"Error al importar '{ruta}': {e}")
+        print("Las filas confirmadas se conservan; la próxima importación se reanudará desde el último punto de control.")
+
+def _filas_exportables(conn, tabla, columnas, incluir_archivo):
+    """Recorre una tabla en orden cronológico, empezando por sus archivos mensuales si se piden."""
+    esquemas = []
+    if incluir_archivo and tabla in _TABLAS_ARCHIVABLES:
+        esquemas = [ruta for _, ruta in reversed(_meses_archivados())]
+    for ruta in esquemas + [None]:
+        with (_archivo_adjunto(conn, ruta) if ruta else contextlib.nullcontext("main")) as esquema:
+            if ruta and not _tabla_archivada(conn, esquema, tabla):
+                continue
+            lector = conn.cursor()
+            try:
+                yield from lector.execute(f"SELECT {', '.join(columnas)} FROM {esquema}.{tabla} ORDER BY timestamp, id")
+            finally:
+                lector.close()
+
+def exportar_historial(formato, nombres=None, incluir_archivo=False, salida=None):
+    """Vuelca la bitácora en streaming como historial de bash/zsh (solo eventos) o JSONL (una línea por registro, con su tabla)."""
+    salida = salida or sys.stdout
+    try:
+        conn = _obtener_conexion()
+        if formato in ("bash", "zsh"):
+            filas = _filas_exportables(conn, "eventos_sistema", ("CAST(strftime('%s', timestamp) AS INTEGER)", "comando"), incluir_archivo)
+            for marca, comando in filas:
+                if formato == "bash":
+                    salida.write(f"#{marca}\n{comando}\n")
+                else:
+                    comando = comando.replace("\n", "\\\n")
+                    salida.write(f": {marca}:0;{comando}\n")
+            return
+
+        for nombre in nombres or list(_TABLAS_EXPLORAR):
+            tabla, columnas = _TABLAS_EXPLORAR[nombre][:2]
+            for fila in _filas_exportables(conn, tabla, columnas, incluir_archivo):
+                registro = dict(zip(columnas, fila), tabla=nombre)
+                salida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    except BrokenPipeError:
+        # El consumidor (head, grep -m...) cerró la tubería: se deja de exportar sin error.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), salida.fileno())
+    except sqlite3.Error as e:
+        print(f"Error al exportar la Bitácora Cronos: {e}", file=sys.stderr)
+
+# --- Demonio de ingesta: agrupa eventos y conversaciones en commits por lotes ---
+
+DEMONIO_LOTE = 256            # Filas por commit como máximo.
+DEMONIO_INTERVALO = 0.5       # Segundos máximos que una fila espera en el búfer.
+DEMONIO_BUFFER_MAXIMO = 50000 # Filas pendientes toleradas antes de descartar las más antiguas.
+DEMONIO_REINTENTOS = 5        # Reintentos de un lote ante base de datos bloqueada.
+
+_SQL_DEMONIO = {
+    "evento": "INSERT INTO eventos_sistema (timestamp, directorio, comando, sesion_id, embedding_vector, embedding_version) VALUES (?, ?, ?, ?, ?, ?)",
+    "conversacion": "INSERT INTO conversaciones (timestamp, sesion_id, autor, texto, embedding_vector, embedding_version) VALUES (?, ?, ?, ?, ?, ?)"
+}
+
+def _ruta_socket():
+    """Devuelve la ruta del socket Unix del demonio de ingesta."""
+    return DB_PATH + ".sock"
+
+def _enviar_al_demonio(tipo, *campos):
+    """Envía una fila al demonio de ingesta; devuelve False si no está en marcha y hay que insertar directamente."""
+    # Comprobar el fichero evita importar socket cuando el demonio no se usa.
+    if not os.path.exists(_ruta_socket()):
+        return False
+    # El timestamp se fija al enviar (UTC, como CURRENT_TIMESTAMP) para no depender del retardo del lote.
+    campos = (tipo, time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())) + campos
+    if any('\0' in campo for campo in campos):
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as cliente:
+            # Sin bloqueo: si el búfer del demonio está lleno, el prompt no espera.
+            cliente.setblocking(False)
+            cliente.sendto('\0'.join(campos).encode('utf-8'), _ruta_socket())
+        return True
+    except OSError:
+        # Socket huérfano, demonio caído, búfer lleno o mensaje demasiado grande para un datagrama.
+        return False
+
+def _consultar_demonio(orden, espera=2.0):
+    """Envía una orden de control al demonio y devuelve su respuesta (o None si no responde)."""
+    ruta_respuesta = f"{_ruta_socket()}.{os.getpid()}"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as cliente:
+        cliente.bind(ruta_respuesta)
+        try:
+            cliente.settimeout(espera)
+            cliente.sendto(f"{orden}\0{ruta_respuesta}".encode('utf-8'), _ruta_socket())
+            return cliente.recv(65536).decode('utf-8')
+        except OSError:
+            return None
+        finally:
+            os.remove(ruta_respuesta)
+
+def _volcar_lote(pendientes, estadisticas):
+    """Inserta las filas pendientes en una sola transacción; devuelve False si la base de datos sigue bloqueada."""
+    filas = {tipo: [] for tipo in _SQL_DEMONIO}
+    for tipo, campos in pendientes:
+        texto = campos[2] if tipo == "evento" else campos[3]
+        filas[tipo].append(campos + (_generate_simple_embedding(texto), EMBEDDING_VERSION))
+
+    for intento in range(DEMONIO_REINTENTOS):
+        try:
+            with transaccion() as conn:
+                for tipo, sql in _SQL_DEMONIO.items():
+                    if filas[tipo]:
+                        conn.executemany(sql, filas[tipo])
+            estadisticas["escritas"] += len(pendientes)
+            estadisticas["lotes"] += 1
+            return True
+        except sqlite3.OperationalError:
+            time.sleep(0.05 * (2 ** intento))
+    estadisticas["reintentos_agotados"] += 1
+    return False
+
+def _informe_demonio(estadisticas, pendientes):
+    """Formatea las estadísticas de rendimiento del demonio."""
+    activo = time.monotonic() - estadisticas["inicio"]
+    return (f"Activo: {activo:.1f} s | Recibidas: {estadisticas['recibidas']} | Escritas: {estadisticas['escritas']} "
+            f"({estadisticas['escritas'] / activo if activo else 0:.1f} filas/s) | Lotes: {estadisticas['lotes']} | "
+            f"Pendientes: {pendientes} | Descartadas: {estadisticas['descartadas']} | Malformadas: {estadisticas['malformadas']}")
+
+def ejecutar_demonio():
+    """Ejecuta en primer plano el demonio de ingesta que agrupa las escrituras en commits por lotes."""
+    ruta = _ruta_socket()
+    if os.path.exists(ruta):
+        if _consultar_demonio("estado", espera=0.5) is not None:
+            print(f"El demonio de ingesta ya está en marcha en {ruta}.")
+            return
+        os.remove(ruta)  # Socket huérfano de un demonio anterior.
+
+    _obtener_conexion()
+    servidor = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    servidor.bind(ruta)
+    estadisticas = {"inicio": time.monotonic(), "recibidas": 0, "escritas": 0, "lotes": 0,
+                    "descartadas": 0, "malformadas": 0, "reintentos_agotados": 0}
+    pendientes = []
+    limite = None
+    en_marcha = True
+
+    def detener(signum, frame):
+        nonlocal en_marcha
+        en_marcha = False
+
+    signal.signal(signal.SIGTERM, detener)
+    signal.signal(signal.SIGINT, detener)
+    print(f"Demonio de ingesta escuchando en {ruta} (lote: {DEMONIO_LOTE}, intervalo: {DEMONIO_INTERVALO} s).")
+
+    try:
+        while en_marcha:
+            # Sin filas pendientes se despierta cada segundo para atender las señales de parada.
+            servidor.settimeout(max(0.0, limite - time.monotonic()) if limite else 1.0)
+            try:
+                datos = servidor.recv(1 << 20)
+            except socket.timeout:
+                datos = None
+            except InterruptedError:
+                continue
+
+            if datos:
+                campos = datos.decode('utf-8', errors='replace').split('\0')
+                if campos[0] in _SQL_DEMONIO and len(campos) == 5:
+                    pendientes.append((campos[0], tuple(campos[1:])))
+                    estadisticas["recibidas"] += 1
+                    limite = limite or time.monotonic() + DEMONIO_INTERVALO
+                elif campos[0] == "estado" and len(campos) == 2:
+                    try:
+                        servidor.sendto(_informe_demonio(estadisticas, len(pendientes)).encode('utf-8'), campos[1])
+                    except OSError as e:
+                        _error_silenciado("demonio_estado", e)
+                elif campos[0] == "detener":
+                    en_marcha = False
+                else:
+                    estadisticas["malformadas"] += 1
+
+            if pendientes and (len(pendientes) >= DEMONIO_LOTE or time.monotonic() >= limite):
+                lote = pendientes[:DEMONIO_LOTE]
+                if _volcar_lote(lote, estadisticas):
+                    del pendientes[:DEMONIO_LOTE]
+                elif len(pendientes) > DEMONIO_BUFFER_MAXIMO:
+                    exceso = len(pendientes) - DEMONIO_BUFFER_MAXIMO
+                    del pendientes[:exceso]
+                    estadisticas["descartadas"] += exceso
+                limite = time.monotonic() + DEMONIO_INTERVALO if pendientes else None
+    finally:
+        servidor.close()
+        os.remove(ruta)
+        # Vaciado final: lo que no se pueda escribir ahora se contabiliza como descartado.
+        while pendientes:
+            lote = pendientes[:DEMONIO_LOTE]
+            if not _volcar_lote(lote, estadisticas):
+                estadisticas["descartadas"] += len(pendientes)
+                break
+            del pendientes[:DEMONIO_LOTE]
+        cerrar_conexion()
+        print(f"Demonio de ingesta detenido. {_informe_demonio(estadisticas, 0)}")
+
+def estado_demonio():
+    """Muestra el rendimiento y las filas descartadas del demonio de ingesta."""
+    if not os.path.exists(_ruta_socket()):
+        print("El demonio de ingesta no está en marcha.")
+        return
+    respuesta = _consultar_demonio("estado")
+    print(respuesta if respuesta is not None else "El demonio de ingesta no responde.")
+
+def _enviar_orden_demonio(orden):
+    """Envía una orden sin respuesta al demonio de ingesta."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as cliente:
+            cliente.sendto(orden.encode('utf-8'), _ruta_socket())
+        return True
+    except OSError:
+        return False
+
+def detener_demonio():
+    """Pide al demonio de ingesta que vacíe su búfer y termine."""
+    if not os.path.exists(_ruta_socket()) or not _enviar_orden_demonio("detener"):
+        print("El demonio de ingesta no está en marcha.")
+    else:
+        print("Orden de parada enviada al demonio de ingesta.")
+
+def _percentil(valores, p):
+    """Percentil p (0-100) por rango más cercano de una lista de valores."""
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))]
+
+def _copiar_esquema(destino):
+    """Crea en 'destino' una base de datos vacía con el mismo esquema que la bitácora."""
+    conn = _obtener_conexion()
+    sentencias = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' ORDER BY type = 'table' DESC"
+    ).fetchall()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    copia = sqlite3.connect(destino)
+    for (sql,) in sentencias:
+        try:
+            copia.execute(sql)
+        except sqlite3.Error:
+            # Tablas internas creadas automáticamente por otra sentencia (p. ej. tablas virtuales).
+            pass
+    copia.execute(f"PRAGMA user_version = {version}")
+    copia.commit()
+    copia.close()
+
+def medir_arranque(repeticiones=20):
+    """Mide la latencia del gancho de registro de eventos frente al arranque del intérprete vacío."""
+    try:
+        with tempfile.TemporaryDirectory() as directorio:
+            db_prueba = os.path.join(directorio, "cronos.db")
+            _copiar_esquema(db_prueba)
+            entorno = dict(os.environ, CRONOS_DB=db_prueba)
+            gancho = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cronos_evento.py")
+
+            def cronometrar(argumentos):
+                inicio = time.perf_counter()
+                subprocess.run(argumentos, env=entorno, check=True)
+                return (time.perf_counter() - inicio) * 1000
+
+            # Una ejecución previa genera el bytecode en caché, como ocurre tras el primer uso real.
+            cronometrar([sys.executable, gancho, "echo", "calentamiento"])
+            vacio = [cronometrar([sys.executable, "-c", "pass"]) for _ in range(repeticiones)]
+            evento = [cronometrar([sys.executable, gancho, "echo", "medicion"]) for _ in range(repeticiones)]
+
+        print(f"--- [ Latencia del gancho de eventos ({repeticiones} repeticiones) ] ---")
+        for nombre, tiempos in (("Intérprete vacío", vacio), ("cronos_evento.py", evento)):
+            print(f"{nombre:<18} mediana: {statistics.median(tiempos):7.2f} ms  p95: {_percentil(tiempos, 95):7.2f} ms  mín: {min(tiempos):7.2f} ms")
+        print(f"Coste propio de Cronos (mediana): {statistics.median(evento) - statistics.median(vacio):.2f} ms")
+        print("------------------------------------------------------------------")
+
+    except (sqlite3.Error, OSError, subprocess.CalledProcessError) as e:
+        print(f"Error al medir el arranque: {e}")
+
+def _plan_consulta(cursor, sql):
+    """Devuelve las líneas de EXPLAIN QUERY PLAN de una sentencia medida, con los parámetros a NULL (None si no es una consulta)."""
+    if sql.split(None, 1)[0].upper() not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+        return None
+    try:
+        filas = cursor.execute("EXPLAIN QUERY PLAN " + sql.replace("?", "NULL")).fetchall()
+    except sqlite3.Error as e:
+        # Por ejemplo, sentencias sobre un archivo mensual que ya no está adjunto.
+        return [f"(plan no disponible: {e})"]
+    profundidad = {0: 0}
+    lineas = []
+    for nodo, padre, _, detalle in filas:
+        profundidad[nodo] = profundidad.get(padre, 0) + 1
+        lineas.append("  " * profundidad[nodo] + detalle)
+    return lineas
+
+def informe_perf(limite=PERF_LIMITE_INFORME):
+    """Muestra las operaciones y sentencias más lentas medidas con CRONOS_PERF=guardar, sus planes de consulta y los errores silenciados."""
+    try:
+        cursor = _obtener_conexion().cursor()
+        print("\n--- [ Rendimiento de la Bitácora Cronos ] ---")
+        cursor.execute(
+            "SELECT operacion, COUNT(*), AVG(duracion_ms), MAX(duracion_ms), AVG(sentencias), AVG(instrucciones), AVG(bytes_leidos), "
+            "AVG(conexiones) FROM metricas_operaciones GROUP BY operacion ORDER BY AVG(duracion_ms) DESC LIMIT ?", (limite,)
+        )
+        operaciones = cursor.fetchall()
+        if not operaciones:
+            print("No hay métricas guardadas: ejecute los comandos con CRONOS_PERF=guardar.")
+        else:
+            print("Operaciones más lentas (media por ejecución):")
+            for operacion, n, media, maximo, sentencias, instrucciones, leidos, conexiones in operaciones:
+                print(f"  {operacion:<28} {n:>6}x  media {media:9.2f} ms  máx {maximo:9.2f} ms  sentencias {sentencias:7.1f}  "
+                      f"instrucciones ~{instrucciones:,.0f}  leídos {leidos / 1024:,.0f} KB  conexiones {conexiones:.1f}")
+
+        cursor.execute(
+            "SELECT sql, ejecuciones, total_ms, maximo_ms, filas, instrucciones FROM metricas_sentencias ORDER BY total_ms DESC LIMIT ?",
+            (limite,)
+        )
+        sentencias = cursor.fetchall()
+        if sentencias:
+            print("\nSentencias con más tiempo acumulado:")
+        for i, (sql, n, total, maximo, filas, instrucciones) in enumerate(sentencias):
+            print(f"{i+1}. {total:.2f} ms en {n} ejecuciones (máx {maximo:.2f} ms), {filas} filas, ~{instrucciones:,} instrucciones\n   {sql}")
+            for linea in _plan_consulta(cursor, sql) or []:
+                print(f"   {linea}")
+
+        cursor.execute("SELECT origen, total, ultimo_mensaje, ultimo FROM errores_silenciados ORDER BY total DESC")
+        errores = cursor.fetchall()
+        print("\nErrores silenciados:" if errores else "\nErrores silenciados: ninguno.")
+        for origen, total, mensaje, ultimo in errores:
+            print(f"  {origen}: {total} (último {ultimo}: {mensaje})")
+        print("------------------------------------------------------------------")
+
+    except sqlite3.Error as e:
+        print(f"Error al generar el informe de rendimiento: {e}")
+
+def limpiar_perf():
+    """Borra las métricas de rendimiento y los errores silenciados acumulados."""
+    try:
+        with transaccion() as conn:
+            for tabla in ("metricas_operaciones", "metricas_sentencias", "errores_silenciados"):
+                conn.execute(f"DELETE FROM {tabla}")
+        print("Métricas de rendimiento eliminadas.")
+    except sqlite3.Error as e:
+        print(f"Error al limpiar las métricas de rendimiento: {e}")
+
+def _extraer_bandera(args, nombre):
+    """Extrae una bandera sin valor de la lista de argumentos y devuelve si estaba presente."""
+    if nombre in args:
+        args.remove(nombre)
+        return True
+    return False
+
+def _extraer_opcion(args, nombre, por_defecto=None):
+    """Extrae '<nombre> <valor>' de la lista de argumentos y devuelve el valor (o el valor por defecto)."""
+    if nombre in args:
+        i = args.index(nombre)
+        valor = args[i + 1] if i + 1 < len(args) else por_defecto
+        del args[i:i + 2]
+        return valor
+    return por_defecto
+
 if __name__ == "__main__":
 
     if len(sys.argv) > 1:
         if sys.argv[1] == '--revisar':
-            revisar_ultima_actividad()
+            args = sys.argv[2:]
+            incluir_archivo = _extraer_bandera(args, '--incluir_archivo')
+            desde = _extraer_opcion(args, '--desde')
+            hasta = _extraer_opcion(args, '--hasta')
+            if args:
+                print("Uso: --revisar [--incluir_archivo] [--desde FECHA] [--hasta FECHA]")
+            else:
+                revisar_ultima_actividad(incluir_archivo, desde, hasta)
         elif sys.argv[1] == '--guardar_conversacion':
             if len(sys.argv) == 4:
                 guardar_conversacion(sys.argv[2], sys.argv[3])
@@ -445,8 +2822,41 @@ if __name__ == "__main__":
             else:
                 print("Uso: --eliminar_memoria <proyecto> <clave>")
         elif sys.argv[1] == '--buscar_similitud':
-            if len(sys.argv) >= 3:
-                query_text = sys.argv[2]
+            args = sys.argv[2:]
+            ann = _extraer_bandera(args, '--ann')
+            medir_recall = _extraer_bandera(args, '--recall')
+            incluir_archivo = _extraer_bandera(args, '--incluir_archivo')
+            usar_cache = not _extraer_bandera(args, '--sin_cache')
+            desde = _extraer_opcion(args, '--desde')
+            hasta = _extraer_opcion(args, '--hasta')
+            try:
+                radio = int(_extraer_opcion(args, '--radio', ANN_RADIO))
+            except ValueError:
+                print("Error: --radio debe ser un número entero.")
+                sys.exit(1)
+            if len(args) >= 1:
+                query_text = args[0]
+                top_n = 5
+                if len(args) == 2:
+                    try:
+                        top_n = int(args[1])
+                    except ValueError:
+                        print("Error: top_n debe ser un número entero.")
+                        sys.exit(1)
+                buscar_similitud(query_text, top_n, ann=ann, radio=radio, medir_recall=medir_recall,
+                                 incluir_archivo=incluir_archivo, desde=desde, hasta=hasta, usar_cache=usar_cache)
+            else:
+                print("Uso: --buscar_similitud <texto_consulta> [top_n] [--ann] [--radio N] [--recall]")
+                print("       [--incluir_archivo] [--desde FECHA] [--hasta FECHA] [--sin_cache]")
+        elif sys.argv[1] == '--cache':
+            if len(sys.argv) == 3 and sys.argv[2] == 'estado':
+                estado_cache()
+            elif len(sys.argv) == 3 and sys.argv[2] == 'limpiar':
+                limpiar_cache()
+            else:
+                print("Uso: --cache estado|limpiar")
+        elif sys.argv[1] == '--buscar':
+            if len(sys.argv) in (3, 4):
                 top_n = 5
                 if len(sys.argv) == 4:
                     try:
@@ -454,11 +2864,116 @@ if __name__ == "__main__":
                     except ValueError:
                         print("Error: top_n debe ser un número entero.")
                         sys.exit(1)
-                buscar_similitud(query_text, top_n)
+                buscar_texto(sys.argv[2], top_n)
             else:
-                print("Uso: --buscar_similitud <texto_consulta> [top_n]")
+                print("Uso: --buscar <palabras_clave> [top_n]")
+        elif sys.argv[1] == '--explorar':
+            args = sys.argv[2:]
+            jsonl = _extraer_bandera(args, '--jsonl')
+            incluir_archivo = _extraer_bandera(args, '--incluir_archivo')
+            opciones = {nombre: _extraer_opcion(args, f'--{nombre}') for nombre in ("sesion", "directorio", "autor", "proyecto", "status")}
+            desde = _extraer_opcion(args, '--desde')
+            hasta = _extraer_opcion(args, '--hasta')
+            antes = _extraer_opcion(args, '--antes')
+            limite = _extraer_opcion(args, '--limite', '50')
+            filtros = {nombre: valor for nombre, valor in opciones.items() if valor is not None}
+            # El cursor de --antes es 'TIMESTAMP|ID', tal como lo imprime la página anterior.
+            marca, _, ultimo_id = (antes or "").rpartition("|")
+            cursor_valido = antes is None or (marca != "" and ultimo_id.isdigit())
+            if len(args) != 1 or args[0] not in _TABLAS_EXPLORAR or not limite.isdigit() or not cursor_valido:
+                print("Uso: --explorar eventos|conversaciones|memoria|tareas [--sesion S] [--directorio D] [--autor A]")
+                print("       [--proyecto P] [--status E] [--desde FECHA] [--hasta FECHA] [--limite N (0 = todo)] [--antes CURSOR] [--jsonl]")
+                print("       [--incluir_archivo]")
+            elif set(filtros) - set(_TABLAS_EXPLORAR[args[0]][2]):
+                print(f"Filtros admitidos para '{args[0]}': {', '.join('--' + f for f in _TABLAS_EXPLORAR[args[0]][2])}")
+            else:
+                explorar_actividad(args[0], filtros, desde, hasta, int(limite), antes, jsonl, incluir_archivo)
+        elif sys.argv[1] == '--anexar_log':
+            if len(sys.argv) in (3, 4) and (len(sys.argv) == 3 or sys.argv[3] in _COLUMNAS_LOG):
+                flujo = sys.argv[3] if len(sys.argv) == 4 else "output"
+                if not anexar_log_tarea(sys.argv[2], flujo, sys.stdin.buffer):
+                    sys.exit(1)
+            else:
+                print("Uso: <comando> | --anexar_log <task_id> [output|error]")
+        elif sys.argv[1] == '--log_tarea':
+            args = sys.argv[2:]
+            cola = _extraer_opcion(args, '--cola')
+            if len(args) in (1, 2) and (len(args) == 1 or args[1] in _COLUMNAS_LOG) and (cola is None or cola.isdigit()):
+                leer_log_tarea(args[0], args[1] if len(args) == 2 else "output", int(cola) if cola else None)
+            else:
+                print("Uso: --log_tarea <task_id> [output|error] [--cola N]")
+        elif sys.argv[1] == '--indice_ann':
+            if len(sys.argv) == 3 and sys.argv[2] == 'activar':
+                activar_indice_ann()
+            elif len(sys.argv) == 3 and sys.argv[2] == 'desactivar':
+                desactivar_indice_ann()
+            else:
+                print("Uso: --indice_ann activar|desactivar")
+        elif sys.argv[1] == '--demonio':
+            if len(sys.argv) == 3 and sys.argv[2] == 'estado':
+                estado_demonio()
+            elif len(sys.argv) == 3 and sys.argv[2] == 'detener':
+                detener_demonio()
+            elif len(sys.argv) == 2:
+                ejecutar_demonio()
+            else:
+                print("Uso: --demonio [estado|detener]")
+        elif sys.argv[1] == '--medir_arranque':
+            if len(sys.argv) == 3:
+                medir_arranque(int(sys.argv[2]))
+            else:
+                medir_arranque()
+        elif sys.argv[1] == '--perf':
+            if len(sys.argv) == 2:
+                informe_perf()
+            elif len(sys.argv) == 3 and sys.argv[2] == 'limpiar':
+                limpiar_perf()
+            else:
+                print("Uso: --perf [limpiar]  (las métricas se registran con CRONOS_PERF=guardar)")
+        elif sys.argv[1] == '--archivar':
+            if len(sys.argv) == 3 and sys.argv[2].isdigit():
+                archivar_historial(int(sys.argv[2]))
+            elif len(sys.argv) == 2:
+                archivar_historial()
+            else:
+                print(f"Uso: --archivar [dias] (por defecto {RETENCION_DIAS})")
+        elif sys.argv[1] == '--normalizar_eventos':
+            normalizar_eventos()
+        elif sys.argv[1] == '--importar':
+            args = sys.argv[2:]
+            reiniciar = _extraer_bandera(args, '--reiniciar')
+            if len(args) == 2 and args[0] in _LECTORES_IMPORTACION:
+                importar_historial(args[0], args[1], reiniciar)
+            else:
+                print("Uso: --importar bash|zsh|jsonl <fichero> [--reiniciar]")
+        elif sys.argv[1] == '--exportar':
+            args = sys.argv[2:]
+            incluir_archivo = _extraer_bandera(args, '--incluir_archivo')
+            ruta_salida = _extraer_opcion(args, '--salida')
+            if args and args[0] in _LECTORES_IMPORTACION and all(nombre in _TABLAS_EXPLORAR for nombre in args[1:]) \
+                    and (args[0] == "jsonl" or len(args) == 1):
+                with (open(ruta_salida, "w") if ruta_salida else contextlib.nullcontext(sys.stdout)) as salida:
+                    exportar_historial(args[0], args[1:], incluir_archivo, salida)
+            else:
+                print("Uso: --exportar bash|zsh [--incluir_archivo] [--salida FICHERO]")
+                print("       --exportar jsonl [eventos|conversaciones|memoria|tareas ...] [--incluir_archivo] [--salida FICHERO]")
+        elif sys.argv[1] == '--recalcular_embeddings':
+            args = sys.argv[2:]
+            incluir_archivo = _extraer_bandera(args, '--incluir_archivo')
+            procesos = _extraer_opcion(args, '--procesos')
+            if args or (procesos is not None and not procesos.isdigit()):
+                print("Uso: --recalcular_embeddings [--procesos N] [--incluir_archivo]")
+            else:
+                recalcular_embeddings(int(procesos) if procesos else None, incluir_archivo)
+        elif sys.argv[1] == '--migrar_embeddings':
+            migrar_embeddings_binarios()
         elif sys.argv[1] == '--analizar_comportamientos':
-            analizar_comportamientos_sistema()
+            args = sys.argv[2:]
+            sesion_id = _extraer_opcion(args, '--sesion')
+            if len(args) > 1 or (args and args[0] not in VENTANAS_ANALISIS):
+                print("Uso: --analizar_comportamientos [hora|dia|semana] [--sesion <sesion_id>]")
+            else:
+                analizar_comportamientos_sistema(args[0] if args else None, sesion_id)
         elif sys.argv[1] == '--generar_resumen':
             if len(sys.argv) == 4:
                 entry_type = sys.argv[2]
@@ -471,4 +2986,4 @@ if __name__ == "__main__":
             revisar_tareas_omnicompute()
         else:
             comando_completo = ' '.join(sys.argv[1:])
-            registrar_evento(comando_completo)
+            registrar_evento(comando_completo, indexar=False)